@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+##
+# This module contains a front end which inspects its input and sorts it with whichever of the
+# algorithms in this directory should be fastest:
+#
+#   insertion_sort      short arrays
+#   mergesort:natural   arrays which are already sorted or reverse sorted, or nearly so
+#   counting_sort       arrays of ints whose values span a range not much longer than the array
+#   radix_sort          arrays of ints whose values span at most `radix_max_bits` bits
+#   quicksort_3way      arrays in which most of a sample of the elements are duplicates
+#   quicksort           everything else (introsort, which falls back to heapsort if needed)
+#
+# The inspection is cheap. Presortedness is estimated from the descents in a few short windows
+# spread through the array and the duplicate ratio from a random sample. Only the value range and
+# the int check look at every element, and then only when the sample is all ints.
+#
+# The default thresholds in `THRESHOLDS` were calibrated against the 'rand', 'uni', 'asc', 'des',
+# 'dup' and 'int64' distributions of `compare_sorts.py` at sizes from 8 to 100,000. Any of them can
+# be overridden for a single call:
+#
+#   name = auto_sort.auto_sort(array, radix_max_bits=16)
+##
+
+import unittest
+import random
+import array as typed_array
+
+import counting_sort
+import insertion_sort
+import mergesort
+import numpy_backend
+import quicksort
+import quicksort_3way
+import radix_sort
+
+
+THRESHOLDS = {
+    # Arrays of this length or shorter are sorted using insertion sort.
+    "insertion_max": 32,
+    # Arrays are treated as presorted if at most this fraction of the sampled adjacent pairs are
+    # descents (or ascents, for reverse sorted arrays).
+    "presorted_ratio": 0.05,
+    # Arrays of ints are counting sorted if max - min + 1 is at most this multiple of the length.
+    "counting_max_range": 2,
+    # Arrays of ints are radix sorted if max - min fits in this many bits. Each 8 bits is a pass.
+    "radix_max_bits": 24,
+    # Arrays are sorted using 3-way quicksort if at least this fraction of the sample are duplicates.
+    "duplicate_ratio": 0.5,
+    # Number of elements inspected by the presortedness and duplicate estimates.
+    "sample_size": 256,
+}
+
+# Length of each window of adjacent elements sampled for the presortedness estimate.
+WINDOW = 16
+
+
+algorithms = {
+    "insertion_sort": insertion_sort.sort,
+    "mergesort:natural": lambda array: mergesort.sort(array, mode="natural"),
+    "counting_sort": counting_sort.sort,
+    "radix_sort": radix_sort.lsd_sort,
+    "quicksort_3way": quicksort_3way.sort,
+    "quicksort": quicksort.sort,
+}
+
+
+# Sorts `array` in place and returns the name of the algorithm used. Keyword arguments override
+# the entries of `THRESHOLDS` with the same names.
+def auto_sort(array, **overrides):
+    name = choose(array, **overrides)
+    algorithms[name](array)
+    return name
+
+
+# Returns the name of the algorithm `auto_sort()` would use for `array`.
+def choose(array, **overrides):
+    for name in overrides:
+        if name not in THRESHOLDS:
+            raise TypeError(f"unknown threshold: {name}")
+    thresholds = dict(THRESHOLDS, **overrides)
+
+    n = len(array)
+    if n <= thresholds["insertion_max"]:
+        return "insertion_sort"
+
+    # The vectorized backend handles every distribution well.
+    if numpy_backend.as_ndarray(array) is not None:
+        return "quicksort"
+
+    descents = descent_ratio(array, thresholds["sample_size"])
+    presorted = thresholds["presorted_ratio"]
+    if descents <= presorted or descents >= 1 - presorted:
+        return "mergesort:natural"
+
+    sample = [array[i] for i in random.sample(range(n), min(thresholds["sample_size"], n))]
+    if all(type(item) is int for item in sample):
+        # The value range is cheaper to find than checking every element is an int.
+        low, high = min(array), max(array)
+        if type(low) is int and type(high) is int and all_ints(array):
+            if high - low + 1 <= thresholds["counting_max_range"] * n:
+                return "counting_sort"
+            if (high - low).bit_length() <= thresholds["radix_max_bits"]:
+                return "radix_sort"
+
+    if duplicate_ratio(sample) >= thresholds["duplicate_ratio"]:
+        return "quicksort_3way"
+    return "quicksort"
+
+
+# Returns the fraction of adjacent pairs which are descents in about `sample_size` elements taken
+# as evenly spaced windows of WINDOW consecutive elements.
+def descent_ratio(array, sample_size):
+    n = len(array)
+    windows = max(min(sample_size // WINDOW, n // WINDOW), 1)
+    length = min(WINDOW, n)
+    descents = pairs = 0
+    for w in range(windows):
+        start = w * (n - length) // max(windows - 1, 1)
+        for i in range(start + 1, start + length):
+            if array[i] < array[i - 1]:
+                descents += 1
+        pairs += length - 1
+    return descents / pairs if pairs else 0.0
+
+
+# Returns the fraction of the elements of `sample` which are equal to an earlier element.
+def duplicate_ratio(sample):
+    if not sample:
+        return 0.0
+    ordered = list(sample)
+    quicksort_3way.sort(ordered)
+    duplicates = sum(1 for i in range(1, len(ordered)) if not ordered[i - 1] < ordered[i])
+    return duplicates / len(ordered)
+
+
+# Returns true if every element of `array` is a plain int. An `array.array` with an integer
+# typecode is accepted without checking its elements.
+def all_ints(array):
+    if isinstance(array, typed_array.array):
+        return array.typecode in "bBhHiIlLqQ"
+    return all(type(item) is int for item in array)
+
+
+class TestAutoSort(unittest.TestCase):
+
+    def test_sorts(self):
+        n = 5000
+        arrays = [
+            [random.random() for i in range(n)],
+            [random.randint(0, n) for i in range(n)],
+            [random.randint(-2**63, 2**63 - 1) for i in range(n)],
+            [random.randint(0, 50) for i in range(n)],
+            [float(random.randint(0, 50)) for i in range(n)],
+            [1 for i in range(n)],
+            [i for i in range(n)],
+            [i for i in range(n, 0, -1)],
+            [str(random.randint(0, 10000)) for i in range(n)],
+            [random.randint(0, 10) for i in range(20)],
+            [],
+        ]
+        for test_array in arrays:
+            expected = sorted(test_array)
+            name = auto_sort(test_array)
+            self.assertIn(name, algorithms)
+            self.assertEqual(test_array, expected)
+
+    def test_choices(self):
+        n = 5000
+        self.assertEqual(choose([3, 1, 2]), "insertion_sort")
+        self.assertEqual(choose([i for i in range(n)]), "mergesort:natural")
+        self.assertEqual(choose([i for i in range(n, 0, -1)]), "mergesort:natural")
+        self.assertEqual(choose(random.sample(range(n), n)), "counting_sort")
+        self.assertEqual(choose([random.randint(0, 2**20) for i in range(n)]), "radix_sort")
+        self.assertEqual(choose([random.randint(0, 2**40) for i in range(n)]), "quicksort")
+        self.assertEqual(choose([float(random.randint(0, 50)) for i in range(n)]), "quicksort_3way")
+        self.assertEqual(choose([random.random() for i in range(n)]), "quicksort")
+
+    def test_mixed_types(self):
+        # A float outside the sample must not reach counting sort or radix sort.
+        test_array = random.sample(range(5000), 5000) + [0.5]
+        self.assertNotIn(choose(test_array, sample_size=16), ["counting_sort", "radix_sort"])
+        expected = sorted(test_array)
+        auto_sort(test_array)
+        self.assertEqual(test_array, expected)
+
+    def test_overrides(self):
+        test_array = random.sample(range(5000), 5000)
+        self.assertEqual(choose(test_array, counting_max_range=0), "radix_sort")
+        self.assertEqual(choose(test_array, counting_max_range=0, radix_max_bits=8), "quicksort")
+        self.assertEqual(choose(test_array, insertion_max=10000), "insertion_sort")
+        with self.assertRaises(TypeError):
+            choose(test_array, cutoff=10)
+
+
+if __name__ == '__main__':
+    unittest.main()
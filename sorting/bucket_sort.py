@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+##
+# This module contains a reference implementation of bucket sort for numeric keys which are roughly
+# uniformly distributed, such as the output of `random.random()`. The range between the smallest
+# and largest keys is divided into one bucket per element, one pass counts the elements falling in
+# each bucket, and a second pass places each element in its bucket. On uniform input the expected
+# bucket size is 1, so the buckets are finished cheaply with insertion sort and the whole sort runs
+# in O(n) expected time.
+#
+# Skewed input can put many elements into one bucket. A bucket longer than INSERTION_CUTOFF is
+# bucket sorted again over its own range rather than insertion sorted, and a bucket in which every
+# key is equal is already sorted. A bucket holding more than half of its parent's elements is
+# sorted by natural mergesort instead, so the worst case remains O(n log n).
+#
+# The elements are not moved while sorting. A permutation of their indices is sorted instead and
+# the elements are placed once at the end. Bucket sort is stable: elements with equal keys keep
+# their original relative order.
+##
+
+import unittest
+import random
+import math
+import array as typed_array
+
+import buffers
+import mergesort
+
+
+# Buckets of this length or shorter are sorted using insertion sort.
+INSERTION_CUTOFF = 16
+
+
+# Sorts `array` in place. The keys must be ints or floats other than NaN, either the elements
+# themselves or the result of calling `key` once per element. If `reverse` is true the array is
+# sorted in descending order.
+def sort(array, key=None, reverse=False):
+    n = len(array)
+    if n < 2:
+        return
+    items = list(array)
+    keys = items if key is None else [key(item) for item in items]
+
+    # Reversing before and after the sort keeps elements with equal keys in their original order.
+    perm = list(range(n - 1, -1, -1)) if reverse else list(range(n))
+
+    stack = [(0, n)]
+    while stack:
+        lo, hi = stack.pop()
+        if hi - lo <= INSERTION_CUTOFF:
+            insertion_sort(perm, keys, lo, hi)
+            continue
+
+        segment = perm[lo:hi]
+        seg_keys = [keys[i] for i in segment]
+        low, high = min(seg_keys), max(seg_keys)
+        if not low < high:
+            continue
+
+        # Bucket b holds the keys in [low + b * width, low + (b + 1) * width) where the width is
+        # chosen so that the largest key falls in the last bucket. If the span of the keys or its
+        # scale can't be represented as a float the segment is sorted by comparisons instead.
+        m = hi - lo
+        try:
+            span = float(high - low)
+        except OverflowError:
+            span = math.inf
+        scale = (m - 1) / span
+        if not 0 < scale < math.inf:
+            sort_indices(perm, keys, lo, hi)
+            continue
+        ids = [int((k - low) * scale) for k in seg_keys]
+        count = [0] * (m + 1)
+        for b in ids:
+            count[b + 1] += 1
+        for b in range(m):
+            count[b + 1] += count[b]
+
+        for index, b in zip(segment, ids):
+            perm[lo + count[b]] = index
+            count[b] += 1
+
+        # After placement count[b] is the end of bucket b.
+        start = lo
+        for b in range(m):
+            end = lo + count[b]
+            if end - start > m // 2:
+                sort_indices(perm, keys, start, end)
+            elif end - start > 1:
+                stack.append((start, end))
+            start = end
+
+    if reverse:
+        perm.reverse()
+    buffers.assign(array, [items[i] for i in perm])
+
+
+# Sorts the indices in the half-open slice perm[lo..hi) by their keys using natural mergesort.
+def sort_indices(perm, keys, lo, hi):
+    part = perm[lo:hi]
+    mergesort.sort(part, mode="natural", key=keys.__getitem__)
+    perm[lo:hi] = part
+
+
+# Sorts the indices in the half-open slice perm[lo..hi) by their keys using insertion sort.
+def insertion_sort(perm, keys, lo, hi):
+    for i in range(lo + 1, hi):
+        index = perm[i]
+        k = keys[index]
+        j = i
+        while j > lo and k < keys[perm[j - 1]]:
+            perm[j] = perm[j - 1]
+            j -= 1
+        perm[j] = index
+
+
+# Returns true if the input is empty, of length 1, or sorted in ascending order.
+def is_sorted(array):
+    for index in range(1, len(array)):
+        if array[index] < array[index - 1]:
+            return False
+    return True
+
+
+class TestSort(unittest.TestCase):
+
+    def test_sort(self):
+        test_array = [random.random() for i in range(1000)]
+        while is_sorted(test_array):
+            random.shuffle(test_array)
+        sort(test_array)
+        self.assertTrue(is_sorted(test_array))
+
+    def test_distributions(self):
+        n = 5000
+        arrays = [
+            [random.random() for i in range(n)],
+            [random.expovariate(1.0) for i in range(n)],
+            [random.paretovariate(0.5) for i in range(n)],
+            [2.0 ** -i for i in range(n // 5)],
+            [0.0 if random.random() < 0.9 else random.random() for i in range(n)],
+            [1.0 for i in range(n)],
+            [random.randint(-50, 50) for i in range(n)],
+            [float(i) for i in range(n, 0, -1)],
+            [random.random() for i in range(20)],
+            [],
+        ]
+        for test_array in arrays:
+            expected = sorted(test_array)
+            sort(test_array)
+            self.assertEqual(test_array, expected)
+
+    def test_extreme_spans(self):
+        # Spans which overflow a float, and scales which overflow or underflow, are sorted by
+        # comparisons instead.
+        arrays = [
+            [-1e308, 1e308] * 10,
+            [0.0, 5e-324] * 20,
+            [10**400, 0] * 10,
+            [10**400 + i for i in range(40)] + [0],
+            [random.random() * 1e-320 for i in range(100)],
+            [float("-inf"), float("inf")] + [random.random() for i in range(30)],
+        ]
+        for test_array in arrays:
+            random.shuffle(test_array)
+            expected = sorted(test_array)
+            sort(test_array)
+            self.assertEqual(test_array, expected)
+
+    def test_key_is_stable(self):
+        test_array = [(random.randint(0, 20) / 7, i) for i in range(1000)]
+        expected = sorted(test_array, key=lambda pair: pair[0])
+        sort(test_array, key=lambda pair: pair[0])
+        self.assertEqual(test_array, expected)
+
+    def test_key_reverse_is_stable(self):
+        test_array = [(random.randint(0, 20) / 7, i) for i in range(1000)]
+        expected = sorted(test_array, key=lambda pair: pair[0], reverse=True)
+        sort(test_array, key=lambda pair: pair[0], reverse=True)
+        self.assertEqual(test_array, expected)
+
+    def test_typed_buffers(self):
+        values = [random.random() for i in range(1000)]
+        test_array = typed_array.array('d', values)
+        sort(test_array)
+        self.assertEqual(test_array.tolist(), sorted(values))
+        test_array = buffers.memoryview_of('d', values)
+        sort(test_array, reverse=True)
+        self.assertEqual(test_array.tolist(), sorted(values, reverse=True))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+##
+# This module contains the helpers which let the sort modules work in place on any mutable sequence
+# rather than only on lists: `array.array` instances, memoryviews over a `bytearray` or an mmap cast
+# to a native struct format, and NumPy arrays the vectorized backend can't handle.
+#
+# Auxiliary arrays are created with the same type and format as the input. A scratch copy of an
+# array of 32-bit ints then takes 4 bytes per element rather than a list's 8-byte pointer to a
+# separate int object.
+##
+
+import unittest
+import random
+import copy as copy_module
+import array as typed_array
+
+
+# Returns a new array of the same type and format as `array` holding a copy of array[low..high).
+# (Slicing a memoryview or a NumPy array returns a view of the same memory, not a copy.)
+def copy(array, low=0, high=None):
+    part = array[low:high]
+    if isinstance(part, (list, typed_array.array, bytearray)):
+        return part
+    if isinstance(part, memoryview):
+        return memoryview(bytearray(part)).cast(part.format)
+    return copy_module.copy(part)
+
+
+# Reverses `array` in place.
+def reverse(array):
+    if isinstance(array, (list, typed_array.array, bytearray)):
+        array.reverse()
+    else:
+        array[:] = array[::-1]
+
+
+# Writes the elements of the list `items` over the start of `array`.
+def assign(array, items):
+    if isinstance(array, list):
+        array[:len(items)] = items
+    else:
+        for i, item in enumerate(items):
+            array[i] = item
+
+
+# Returns a memoryview with the native struct format `fmt` over a new bytearray holding `values`.
+def memoryview_of(fmt, values):
+    return memoryview(bytearray(typed_array.array(fmt, values).tobytes())).cast(fmt)
+
+
+class TestBuffers(unittest.TestCase):
+
+    def arrays(self):
+        values = [random.randint(-100, 100) for i in range(100)]
+        yield list(values)
+        yield typed_array.array('i', values)
+        yield memoryview_of('q', values)
+        yield memoryview_of('h', values)[10:90]
+
+    def test_copy(self):
+        for array in self.arrays():
+            part = copy(array, 10, 20)
+            self.assertEqual(type(part), type(array))
+            self.assertEqual(list(part), list(array[10:20]))
+            part[0] = 1000
+            self.assertNotEqual(array[10], 1000)
+            if isinstance(array, memoryview):
+                self.assertEqual(part.format, array.format)
+
+    def test_reverse(self):
+        for array in self.arrays():
+            expected = list(array)[::-1]
+            reverse(array)
+            self.assertEqual(list(array), expected)
+
+    def test_assign(self):
+        for array in self.arrays():
+            assign(array, [1, 2, 3])
+            self.assertEqual(list(array[:3]), [1, 2, 3])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,65 +1,395 @@
 #!/usr/bin/env python3
+##
+# Benchmarks the sorting algorithms in this directory.
+#
+# Every selected algorithm is timed on every selected input distribution at every size in the
+# sweep. Each measurement is preceded by warmup runs and repeated to report the median and 95th
+# percentile runtime; the peak memory allocated while sorting is measured by a separate run under
+# tracemalloc. Results can be written as JSON or CSV and compared against a stored JSON baseline,
+# in which case any measurement whose median has slowed by more than the tolerance is flagged and
+# the script exits with status 1.
+#
+# With --typecode the inputs are `array.array` instances with the given typecode rather than lists.
+#
+# With --count each measurement also records operation counts (comparisons, swaps, writes,
+# auxiliary copies and maximum recursion depth) from a separate instrumented run. See
+# `instrument.py`. The instrumented run sorts a list of wrapped elements, so no counts are recorded
+# with --typecode or for the algorithms in UNCOUNTED, whose timed runs would take a different path.
+#
+# An algorithm is not timed at a size if its runtime there is predicted to exceed the per-run
+# budget, based on its runtimes at smaller sizes. Once skipped it is skipped at all larger sizes.
+# Before the first requested size each algorithm is timed on prefixes of the input of growing
+# length, starting from CALIBRATION_SIZE, so even the first size has a prediction to check.
+#
+# Examples:
+#
+#   ./compare_sorts.py --sizes 1000,10000,100000 --dists rand,dup
+#   ./compare_sorts.py --json results.json
+#   ./compare_sorts.py --baseline results.json --tolerance 0.1
+##
 
 import sys
+import os
 import time
 import random
+import argparse
+import statistics
+import tracemalloc
+import json
+import csv
+import math
+import array as typed_array
 
+import instrument
+
+import auto_sort
 import bubble_sort
+import bucket_sort
+import counting_sort
 import insertion_sort
 import selection_sort
 import shellsort
 import mergesort
 import quicksort
 import quicksort_3way
+import quicksort_dual_pivot
 import heapsort
+import parallel_mergesort
+import radix_sort
+import sample_sort
 
 
-SMALL = 1_000
-LARGE = 10_000
-
+# The parallel sorts fall back to a serial sort below their thresholds or with a single worker, so
+# their rows disable the threshold and use at least two workers to always time the parallel path.
+PARALLEL_WORKERS = max(os.cpu_count() or 1, 2)
 
 algorithms = [
-    bubble_sort,
-    selection_sort,
-    insertion_sort,
-    shellsort,
-    mergesort,
-    quicksort,
-    quicksort_3way,
-    heapsort,
+    ("bubble_sort", bubble_sort.sort),
+    ("selection_sort", selection_sort.sort),
+    ("insertion_sort", insertion_sort.sort),
+    ("shellsort", shellsort.sort),
+    ("shellsort:knuth", lambda array: shellsort.sort(array, gaps="knuth")),
+    ("mergesort", mergesort.sort),
+    ("mergesort:natural", lambda array: mergesort.sort(array, mode="natural")),
+    ("mergesort:pingpong", lambda array: mergesort.sort(array, mode="pingpong")),
+    ("mergesort:lean", lambda array: mergesort.sort(array, mode="lean")),
+    ("quicksort", quicksort.sort),
+    ("quicksort_3way", quicksort_3way.sort),
+    ("quicksort_multikey", quicksort_3way.multikey_sort),
+    ("quicksort_dual_pivot", quicksort_dual_pivot.sort),
+    ("heapsort", heapsort.sort),
+    ("heapsort:4ary", lambda array: heapsort.sort(array, arity=4)),
+    ("heapsort:classic", lambda array: heapsort.heapsort(array, 0, len(array) - 1)),
+    ("parallel_mergesort", lambda array: parallel_mergesort.parallel_sort(array,
+        workers=PARALLEL_WORKERS, threshold=0)),
+    ("radix_sort", radix_sort.sort),
+    ("counting_sort", counting_sort.sort),
+    ("bucket_sort", bucket_sort.sort),
+    ("sample_sort", lambda array: sample_sort.sample_sort(array,
+        workers=PARALLEL_WORKERS, threshold=0)),
+    ("auto_sort", auto_sort.auto_sort),
 ]
 
 
+# Input generators, each taking the array length.
+distributions = {
+    "rand": lambda n: random.sample(range(n), n),
+    "uni": lambda n: [1 for i in range(n)],
+    "asc": lambda n: [i for i in range(n)],
+    "des": lambda n: [i for i in range(n, 0, -1)],
+    "dup": lambda n: [random.randint(0, 50) for i in range(n)],
+    "int32": lambda n: [random.randint(-2**31, 2**31 - 1) for i in range(n)],
+    "int64": lambda n: [random.randint(-2**63, 2**63 - 1) for i in range(n)],
+    "float": lambda n: [random.random() for i in range(n)],
+    "url": lambda n: [f"https://example.com/{random.choice(['src', 'docs', 'tests'])}/"
+        f"{random.randint(0, n)}.html" for i in range(n)],
+}
+
+DEFAULT_DISTRIBUTIONS = "rand,uni,asc,des,dup"
+
+DEFAULT_SIZES = "1000,10000"
+
+# Growth exponent assumed when predicting a runtime from a single smaller size.
+DEFAULT_EXPONENT = 1.5
+
+# Length of the shortest calibration input, and the factor by which each calibration input grows.
+CALIBRATION_SIZE = 256
+CALIBRATION_FACTOR = 4
+
+# Exceptions with which an algorithm rejects an input it doesn't support: counting sort and radix
+# sort need int elements, and counting sort needs them to span a narrow range.
+UNSUPPORTED = (TypeError, ValueError)
+
+# Instrumented runs are skipped if the timed median times this factor exceeds the budget.
+COUNT_OVERHEAD = 20
+
+# Algorithms which choose their code path from the element types or values, or sort in worker
+# processes, so an instrumented run would count different work from the timed runs.
+UNCOUNTED = {"parallel_mergesort", "sample_sort", "auto_sort"}
+
+COUNT_FIELDS = ["comparisons", "swaps", "writes", "aux_copies", "max_depth"]
+
+FIELDS = ["algorithm", "distribution", "size", "median", "p95", "min", "trials", "peak_memory",
+          "skipped", "unsupported"] + COUNT_FIELDS
+
+
 def runtime(func, arg):
     start = time.perf_counter()
     func(arg)
     return time.perf_counter() - start
 
 
-def shuffle(array):
-    random.shuffle(array)
-    return array
+# Returns the peak memory in bytes allocated while running `func(arg)`.
+def peak_memory(func, arg):
+    tracemalloc.start()
+    try:
+        func(arg)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+# Returns the `p`th percentile of `values` using the nearest-rank method.
+def percentile(values, p):
+    ordered = sorted(values)
+    return ordered[max(math.ceil(p / 100 * len(ordered)) - 1, 0)]
+
+
+# Predicts the runtime at size `n` from earlier (size, median) measurements. The growth exponent is
+# estimated from the two largest earlier sizes if there are two.
+def predict(history, n):
+    if not history:
+        return 0.0
+    size, seconds = history[-1]
+    exponent = DEFAULT_EXPONENT
+    if len(history) > 1:
+        prev_size, prev_seconds = history[-2]
+        if prev_seconds > 0 and seconds > 0:
+            exponent = max(math.log(seconds / prev_seconds) / math.log(size / prev_size), 1.0)
+    return seconds * (n / size) ** exponent
+
+
+# Times `func` once on each prefix of `array` of length CALIBRATION_SIZE, CALIBRATION_SIZE *
+# CALIBRATION_FACTOR, and so on, shorter than `array`. Returns the (size, seconds) history, or None
+# if a prefix's runtime is predicted or found to exceed the budget.
+def calibrate(func, array, args):
+    history = []
+    size = CALIBRATION_SIZE
+    while size < len(array):
+        if predict(history, size) > args.budget:
+            return None
+        try:
+            seconds = runtime(func, array[:size])
+        except UNSUPPORTED:
+            # Left for measure() to report.
+            return history
+        if seconds > args.budget:
+            return None
+        history.append((size, seconds))
+        size *= CALIBRATION_FACTOR
+    return history
+
+
+# Times `func` on copies of `array`. Returns a result row, or a row marked as skipped if `history`
+# is None or the runtime predicted from `history` exceeds the budget, or as skipped and unsupported
+# if `func` rejects the input.
+def measure(name, func, dist, array, args, history):
+    row = empty_row(name, dist, len(array))
+    if history is None or predict(history, len(array)) > args.budget:
+        row["skipped"] = True
+        return row
+
+    times = []
+    for i in range(args.warmup + args.repeat):
+        try:
+            seconds = runtime(func, array[:])
+        except UNSUPPORTED:
+            row.update(skipped=True, unsupported=True)
+            return row
+        if i >= args.warmup:
+            times.append(seconds)
+        # A single run over budget ends the measurement.
+        if seconds > args.budget:
+            times = times or [seconds]
+            break
+
+    row.update(median=statistics.median(times), p95=percentile(times, 95), min=min(times),
+        trials=len(times))
+    if not args.no_memory:
+        row["peak_memory"] = peak_memory(func, array[:])
+    countable = not args.typecode and name not in UNCOUNTED
+    if args.count and countable and row["median"] * COUNT_OVERHEAD <= args.budget:
+        try:
+            row.update(instrument.count(func, array))
+        except TypeError:
+            # The algorithm needs the raw element values.
+            pass
+    return row
+
+
+# Returns a result row with no measurements.
+def empty_row(name, dist, size):
+    row = dict(algorithm=name, distribution=dist, size=size, median=None, p95=None, min=None,
+        trials=0, peak_memory=None, skipped=False, unsupported=False)
+    row.update((field, None) for field in COUNT_FIELDS)
+    return row
+
+
+def run(args):
+    selected = [(name, func) for name, func in algorithms
+        if not args.algorithms or name in args.algorithms]
+    random.seed(args.seed)
+
+    print(f"{'algorithm':22} {'dist':6} {'size':>10} {'median (s)':>12} {'p95 (s)':>12}"
+        + ("" if args.no_memory else f" {'peak memory':>16}")
+        + (f" {'comparisons':>12} {'swaps':>10} {'writes':>10} {'aux copies':>10} {'depth':>5}"
+            if args.count else ""))
+
+    rows = []
+    for dist in args.dists:
+        inputs = [distributions[dist](n) for n in args.sizes]
+        if args.typecode:
+            try:
+                inputs = [typed_array.array(args.typecode, array) for array in inputs]
+            except (TypeError, OverflowError):
+                # The typecode can't hold this distribution's elements.
+                for name, func in selected:
+                    for n in args.sizes:
+                        row = empty_row(name, dist, n)
+                        row.update(skipped=True, unsupported=True)
+                        rows.append(row)
+                        print_row(row)
+                continue
+        for name, func in selected:
+            history = calibrate(func, inputs[0], args) if inputs else []
+            unsupported = False
+            for array in inputs:
+                row = measure(name, func, dist, array, args, history)
+                # An input the algorithm rejects at one size is rejected at every larger size.
+                if unsupported:
+                    row["unsupported"] = True
+                unsupported = row["unsupported"]
+                rows.append(row)
+                print_row(row)
+                if row["skipped"] or row["median"] > args.budget:
+                    history = None
+                else:
+                    history.append((len(array), row["median"]))
+    return rows
+
+
+def print_row(row):
+    label = f"{row['algorithm']:22} {row['distribution']:6} {row['size']:>10}"
+    if row["unsupported"]:
+        print(f"{label}   skipped: input not supported")
+        return
+    if row["skipped"]:
+        print(f"{label}   skipped: predicted runtime exceeds budget")
+        return
+    memory = "" if row["peak_memory"] is None else f" {row['peak_memory'] / 1024:12.1f} KiB"
+    counts = ""
+    if row["comparisons"] is not None:
+        counts = f" {row['comparisons']:>12} {row['swaps']:>10} {row['writes']:>10}" \
+            f" {row['aux_copies']:>10} {row['max_depth']:>5}"
+    print(f"{label} {row['median']:12.4f} {row['p95']:12.4f}{memory}{counts}")
+
+
+# Compares `rows` against the rows of a baseline JSON file. Returns a list of regression messages.
+def compare(rows, baseline_path, tolerance):
+    with open(baseline_path) as file:
+        baseline = json.load(file)["results"]
+    previous = {(r["algorithm"], r["distribution"], r["size"]): r for r in baseline}
+
+    regressions = []
+    for row in rows:
+        old = previous.get((row["algorithm"], row["distribution"], row["size"]))
+        if old is None or old["median"] is None or row["median"] is None:
+            continue
+        if row["median"] > old["median"] * (1 + tolerance):
+            change = (row["median"] / old["median"] - 1) * 100
+            regressions.append(f"{row['algorithm']} {row['distribution']} {row['size']}: "
+                f"{old['median']:.4f}s -> {row['median']:.4f}s ({change:+.1f}%)")
+    return regressions
+
+
+def write_json(rows, path, args):
+    meta = dict(sizes=args.sizes, distributions=args.dists, repeat=args.repeat,
+        warmup=args.warmup, budget=args.budget, seed=args.seed, count=args.count,
+        typecode=args.typecode,
+        python=sys.version)
+    with open(path, "w") as file:
+        json.dump(dict(meta=meta, results=rows), file, indent=2)
+
+
+def write_csv(rows, path):
+    with open(path, "w", newline="") as file:
+        writer = csv.DictWriter(file, fieldnames=FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Benchmark the sorting algorithms.")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES,
+        help=f"comma-separated input sizes (default: {DEFAULT_SIZES})")
+    parser.add_argument("--dists", default=DEFAULT_DISTRIBUTIONS,
+        help=f"comma-separated distributions from: {', '.join(distributions)} "
+             f"(default: {DEFAULT_DISTRIBUTIONS})")
+    parser.add_argument("--algorithms", default="",
+        help="comma-separated algorithm names (default: all)")
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs per measurement")
+    parser.add_argument("--warmup", type=int, default=1, help="untimed runs per measurement")
+    parser.add_argument("--budget", type=float, default=2.0,
+        help="maximum seconds for a single run (default: 2.0)")
+    parser.add_argument("--seed", type=int, default=0, help="random seed for the inputs")
+    parser.add_argument("--no-memory", action="store_true",
+        help="skip the tracemalloc peak memory measurement")
+    parser.add_argument("--typecode",
+        help="sort array.array inputs with this typecode instead of lists, e.g. q or d")
+    parser.add_argument("--count", action="store_true",
+        help="record operation counts from an instrumented run")
+    parser.add_argument("--json", help="write the results to this JSON file")
+    parser.add_argument("--csv", help="write the results to this CSV file")
+    parser.add_argument("--baseline", help="compare against the results in this JSON file")
+    parser.add_argument("--tolerance", type=float, default=0.1,
+        help="allowed slowdown against the baseline as a fraction (default: 0.1)")
+    args = parser.parse_args(argv)
+
+    args.sizes = sorted(int(size) for size in args.sizes.split(","))
+    args.dists = args.dists.split(",")
+    args.algorithms = [name for name in args.algorithms.split(",") if name]
+    for dist in args.dists:
+        if dist not in distributions:
+            parser.error(f"unknown distribution: {dist}")
+    names = [name for name, func in algorithms]
+    for name in args.algorithms:
+        if name not in names:
+            parser.error(f"unknown algorithm: {name}")
+    if args.typecode and args.typecode not in typed_array.typecodes:
+        parser.error(f"unknown typecode: {args.typecode}")
+    if args.repeat < 1:
+        parser.error("--repeat must be at least 1")
+    return args
+
 
+# Worker processes may re-import this module so the benchmark only runs when executed directly.
+def main(argv=None):
+    args = parse_args(argv)
+    rows = run(args)
 
-if "uni" in sys.argv or "uniform" in sys.argv:
-    small_array = [1 for i in range(SMALL)]
-    large_array = [1 for i in range(LARGE)]
-elif "asc" in sys.argv or "ascending" in sys.argv:
-    small_array = [i for i in range(SMALL)]
-    large_array = [i for i in range(LARGE)]
-elif "des" in sys.argv or "descending" in sys.argv:
-    small_array = [i for i in range(SMALL, 0, -1)]
-    large_array = [i for i in range(LARGE, 0, -1)]
-elif "dup" in sys.argv or "duplicates" in sys.argv:
-    small_array = [random.randint(0, 50) for i in range(SMALL)]
-    large_array = [random.randint(0, 50) for i in range(LARGE)]
-else:
-    small_array = shuffle([i for i in range(SMALL)])
-    large_array = shuffle([i for i in range(LARGE)])
+    if args.json:
+        write_json(rows, args.json, args)
+    if args.csv:
+        write_csv(rows, args.csv)
 
+    if args.baseline:
+        regressions = compare(rows, args.baseline, args.tolerance)
+        for message in regressions:
+            print(f"REGRESSION {message}")
+        if regressions:
+            return 1
+    return 0
 
-for algorithm in algorithms:
-    t_small = runtime(algorithm.sort, small_array.copy())
-    t_large = runtime(algorithm.sort, large_array.copy())
-    print(f"{algorithm.__name__:16} {t_small:12.4f} {t_large:12.4f}")
 
+if __name__ == '__main__':
+    sys.exit(main())
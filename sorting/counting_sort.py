@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+##
+# This module contains a reference implementation of counting sort for integer keys drawn from a
+# dense range. One pass counts the occurrences of each key, a prefix sum turns the counts into the
+# starting position of each key in the output, and a second pass places each element. No keys are
+# compared, so the sort runs in O(n + r) time for a range of r values.
+#
+# Counting sort is stable: elements with equal keys keep their original relative order.
+##
+
+import unittest
+import random
+import array as typed_array
+
+import buffers
+
+
+# The largest range of key values accepted, limiting the count array to 2^24 entries.
+MAX_RANGE = 2 ** 24
+
+
+# Sorts `array` in place. The keys must be ints, either the elements themselves or the result of
+# calling `key` once per element. If `reverse` is true the array is sorted in descending order.
+# The count array has one entry for each value between the smallest and largest keys; a
+# ValueError is raised if there would be more than MAX_RANGE entries.
+def sort(array, key=None, reverse=False):
+    n = len(array)
+    if n < 2:
+        return
+    items = buffers.copy(array)
+    keys = items if key is None else [key(item) for item in items]
+
+    low, high = min(keys), max(keys)
+    if high - low + 1 > MAX_RANGE:
+        raise ValueError(f"key range {high - low + 1} exceeds MAX_RANGE")
+    count = [0] * (high - low + 1)
+    for k in keys:
+        count[k - low] += 1
+
+    # Convert the counts to the position of the first element with each key.
+    total = 0
+    values = range(len(count) - 1, -1, -1) if reverse else range(len(count))
+    for v in values:
+        total, count[v] = total + count[v], total
+
+    for i in range(n):
+        v = keys[i] - low
+        array[count[v]] = items[i]
+        count[v] += 1
+
+
+# Returns true if the input is empty, of length 1, or sorted in ascending order.
+def is_sorted(array):
+    for index in range(1, len(array)):
+        if array[index] < array[index - 1]:
+            return False
+    return True
+
+
+class TestSort(unittest.TestCase):
+
+    def test_sort(self):
+        test_array = [i for i in range(1000)]
+        while is_sorted(test_array):
+            random.shuffle(test_array)
+        sort(test_array)
+        self.assertTrue(is_sorted(test_array))
+
+    def test_ranges(self):
+        for low, high in [(0, 50), (-1000, 1000), (7, 7), (-5, -1)]:
+            for n in [0, 1, 2, 1000]:
+                test_array = [random.randint(low, high) for i in range(n)]
+                expected = sorted(test_array)
+                sort(test_array)
+                self.assertEqual(test_array, expected)
+
+    def test_key_is_stable(self):
+        test_array = [(random.randint(0, 20), i) for i in range(1000)]
+        expected = sorted(test_array, key=lambda pair: pair[0])
+        sort(test_array, key=lambda pair: pair[0])
+        self.assertEqual(test_array, expected)
+
+    def test_key_reverse_is_stable(self):
+        test_array = [(random.randint(0, 20), i) for i in range(1000)]
+        expected = sorted(test_array, key=lambda pair: pair[0], reverse=True)
+        sort(test_array, key=lambda pair: pair[0], reverse=True)
+        self.assertEqual(test_array, expected)
+
+    def test_typed_buffers(self):
+        values = [random.randint(-100, 100) for i in range(1000)]
+        test_array = typed_array.array('i', values)
+        sort(test_array)
+        self.assertEqual(test_array.tolist(), sorted(values))
+        test_array = buffers.memoryview_of('h', values)
+        sort(test_array, reverse=True)
+        self.assertEqual(test_array.tolist(), sorted(values, reverse=True))
+
+    def test_range_limit(self):
+        with self.assertRaises(ValueError):
+            sort([0, MAX_RANGE])
+        test_array = [MAX_RANGE - 1, 0]
+        sort(test_array)
+        self.assertEqual(test_array, [0, MAX_RANGE - 1])
+
+    def test_non_int_keys(self):
+        with self.assertRaises(TypeError):
+            sort([1.5, 0.5])
+
+
+if __name__ == '__main__':
+    unittest.main()
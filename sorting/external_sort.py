@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+##
+# This module contains an external (out-of-core) mergesort for files too large to fit in memory.
+#
+# The input is read in runs which fit within the memory budget, each run is sorted using the
+# top-down mergesort from `mergesort.py` and spilled to a temporary file, then the runs are combined
+# by a streaming multi-way merge. If there are more runs than the merge fan-in allows, groups of
+# runs are merged into longer runs first.
+#
+# Records are either newline-terminated lines or fixed-width binary records and are compared as raw
+# bytes. As in `mergesort.merge`, ties are resolved in favour of the earlier run so the sort is
+# stable.
+##
+
+import unittest
+import random
+import os
+import sys
+import heapq
+import tempfile
+import contextlib
+import tracemalloc
+
+import mergesort
+
+
+# Default memory budget in bytes.
+MEMORY_LIMIT = 256 * 1024 * 1024
+
+# Default maximum number of runs combined by a single merge.
+FAN_IN = 16
+
+# Estimated per-record cost of holding a record in memory on top of its data: the bytes object
+# header plus a slot in both the run list and the mergesort auxiliary list.
+RECORD_OVERHEAD = sys.getsizeof(b"") + 16
+
+
+# Sorts the file at `input_path` and writes the result to `output_path`. Runs are limited to
+# `memory_limit` bytes and, optionally, to `run_size` records. If `record_size` is set the input is
+# treated as a sequence of fixed-width records, otherwise as a sequence of lines. A final line with
+# no newline is given one in the output.
+def sort_file(input_path, output_path, memory_limit=MEMORY_LIMIT, run_size=None, fan_in=FAN_IN,
+              record_size=None, temp_dir=None):
+    if fan_in < 2:
+        raise ValueError("fan_in must be at least 2")
+
+    # Files are opened unbuffered and each one in a merge, including the output, gets an equal share
+    # of the budget as its I/O buffer. The remaining share holds the records in the merge heap.
+    buffer_size = max(memory_limit // (fan_in + 2), 4096)
+    if record_size:
+        buffer_size = max(buffer_size // record_size, 1) * record_size
+
+    temp_paths = []
+    try:
+        runs = []
+        with open(input_path, 'rb', buffering=0) as file:
+            records = read_records(file, record_size, buffer_size)
+            # The input and output buffers come out of the budget for each run.
+            run_limit = max(memory_limit - 3 * buffer_size, buffer_size)
+            for run in read_runs(records, run_limit, run_size):
+                mergesort.sort(run)
+                path = temp_file(temp_dir, temp_paths)
+                with open(path, 'wb', buffering=0) as out:
+                    write_records(out, run, buffer_size)
+                runs.append(path)
+                del run
+
+        while len(runs) > fan_in:
+            merged = []
+            for i in range(0, len(runs), fan_in):
+                path = temp_file(temp_dir, temp_paths)
+                merge_files(runs[i:i + fan_in], path, record_size, buffer_size)
+                for run_path in runs[i:i + fan_in]:
+                    os.remove(run_path)
+                merged.append(path)
+            runs = merged
+
+        merge_files(runs, output_path, record_size, buffer_size)
+    finally:
+        for path in temp_paths:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(path)
+
+
+# Groups the stream of records into lists which fit within the memory budget.
+def read_runs(records, memory_limit, run_size):
+    run, used = [], 0
+    for record in records:
+        run.append(record)
+        used += len(record) + RECORD_OVERHEAD
+        if used >= memory_limit or len(run) == run_size:
+            yield run
+            run, used = [], 0
+    if run:
+        yield run
+
+
+# Yields the records from an unbuffered binary file, reading into a single preallocated buffer of
+# `buffer_size` bytes. The buffer only grows if a line is longer than it.
+def read_records(file, record_size, buffer_size):
+    buffer = bytearray(buffer_size)
+    view = memoryview(buffer)
+    start = end = 0
+    while True:
+        if record_size:
+            stop = start + record_size if end - start >= record_size else 0
+        else:
+            stop = buffer.find(b"\n", start, end) + 1
+        if stop:
+            yield bytes(view[start:stop])
+            start = stop
+            continue
+
+        # Move the partial record to the front of the buffer and refill the rest.
+        view[:end - start] = view[start:end]
+        end, start = end - start, 0
+        if end == len(buffer):
+            view.release()
+            buffer.extend(bytes(len(buffer)))
+            view = memoryview(buffer)
+        count = file.readinto(view[end:])
+        if count:
+            end += count
+            continue
+
+        if end and record_size:
+            raise ValueError("input length is not a multiple of record_size")
+        if end:
+            yield bytes(view[:end]) + b"\n"
+        return
+
+
+# Writes the records to an unbuffered binary file, collecting them in a single preallocated buffer
+# of `buffer_size` bytes.
+def write_records(file, records, buffer_size):
+    buffer = bytearray(buffer_size)
+    view = memoryview(buffer)
+    used = 0
+    for record in records:
+        if used + len(record) > buffer_size:
+            write_all(file, view[:used])
+            used = 0
+            if len(record) > buffer_size:
+                write_all(file, memoryview(record))
+                continue
+        view[used:used + len(record)] = record
+        used += len(record)
+    write_all(file, view[:used])
+
+
+# Unbuffered writes may be partial so write until the data is exhausted.
+def write_all(file, data):
+    while data:
+        data = data[file.write(data):]
+
+
+# Streams a multi-way merge of the sorted files in `paths` to `output_path`.
+def merge_files(paths, output_path, record_size, buffer_size):
+    with contextlib.ExitStack() as stack:
+        streams = []
+        for path in paths:
+            file = stack.enter_context(open(path, 'rb', buffering=0))
+            streams.append(read_records(file, record_size, buffer_size))
+        out = stack.enter_context(open(output_path, 'wb', buffering=0))
+        write_records(out, merge_streams(streams), buffer_size)
+
+
+# Yields the records from the sorted streams in order. Heap entries are (record, stream index) pairs
+# so equal records leave in stream order.
+def merge_streams(streams):
+    heap = []
+    for i, stream in enumerate(streams):
+        record = next(stream, None)
+        if record is not None:
+            heap.append((record, i))
+    heapq.heapify(heap)
+
+    while heap:
+        record, i = heap[0]
+        yield record
+        record = next(streams[i], None)
+        if record is None:
+            heapq.heappop(heap)
+        else:
+            heapq.heapreplace(heap, (record, i))
+
+
+# Creates a new temporary file and records its path for cleanup.
+def temp_file(temp_dir, temp_paths):
+    fd, path = tempfile.mkstemp(prefix="extsort-", suffix=".run", dir=temp_dir)
+    os.close(fd)
+    temp_paths.append(path)
+    return path
+
+
+class TestExternalSort(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.input_path = os.path.join(self.temp_dir.name, "input")
+        self.output_path = os.path.join(self.temp_dir.name, "output")
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_lines(self):
+        lines = [f"{random.randint(0, 10**6)}\n".encode() for i in range(5000)]
+        with open(self.input_path, 'wb') as file:
+            file.writelines(lines)
+        sort_file(self.input_path, self.output_path, memory_limit=4096, fan_in=3,
+            temp_dir=self.temp_dir.name)
+        with open(self.output_path, 'rb') as file:
+            self.assertEqual(file.readlines(), sorted(lines))
+        self.assertEqual(sorted(os.listdir(self.temp_dir.name)), ["input", "output"])
+
+    def test_run_size(self):
+        lines = [f"{random.random()}\n".encode() for i in range(1000)]
+        with open(self.input_path, 'wb') as file:
+            file.writelines(lines)
+        sort_file(self.input_path, self.output_path, run_size=10, fan_in=4)
+        with open(self.output_path, 'rb') as file:
+            self.assertEqual(file.readlines(), sorted(lines))
+
+    def test_missing_final_newline(self):
+        with open(self.input_path, 'wb') as file:
+            file.write(b"b\nc\na")
+        sort_file(self.input_path, self.output_path)
+        with open(self.output_path, 'rb') as file:
+            self.assertEqual(file.read(), b"a\nb\nc\n")
+
+    def test_fixed_width(self):
+        records = [random.randbytes(8) for i in range(3000)]
+        with open(self.input_path, 'wb') as file:
+            file.writelines(records)
+        sort_file(self.input_path, self.output_path, memory_limit=8192, fan_in=2, record_size=8)
+        with open(self.output_path, 'rb') as file:
+            data = file.read()
+        self.assertEqual(data, b"".join(sorted(records)))
+
+    def test_memory_limit(self):
+        limit = 256 * 1024
+        for record_size in (16, None):
+            if record_size:
+                records = [random.randbytes(record_size) for i in range(40000)]
+            else:
+                records = [f"{random.random()}\n".encode() for i in range(30000)]
+            with open(self.input_path, 'wb') as file:
+                file.writelines(records)
+            tracemalloc.start()
+            try:
+                sort_file(self.input_path, self.output_path, memory_limit=limit, fan_in=4,
+                    record_size=record_size, temp_dir=self.temp_dir.name)
+                peak = tracemalloc.get_traced_memory()[1]
+            finally:
+                tracemalloc.stop()
+            self.assertLessEqual(peak, limit)
+            with open(self.output_path, 'rb') as file:
+                self.assertEqual(file.read(), b"".join(sorted(records)))
+
+    def test_long_lines(self):
+        lines = [random.randbytes(random.randint(0, 10000)).replace(b"\n", b"") + b"\n"
+            for i in range(200)]
+        with open(self.input_path, 'wb') as file:
+            file.writelines(lines)
+        sort_file(self.input_path, self.output_path, memory_limit=4096, fan_in=2)
+        with open(self.output_path, 'rb') as file:
+            self.assertEqual(file.read(), b"".join(sorted(lines)))
+
+    def test_empty(self):
+        open(self.input_path, 'wb').close()
+        sort_file(self.input_path, self.output_path)
+        with open(self.output_path, 'rb') as file:
+            self.assertEqual(file.read(), b"")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,48 +2,160 @@
 ##
 # This module contains a reference implementation of the heapsort algorithm.
 # Sedgewick, R. and Wayne, K. (2011) Algorithms. 4th Edition. Addison-Wesley, p.336.
+#
+# `heapsort()` follows the reference closely. `sort()` uses `dary_heapsort()`, which supports heaps
+# with more than two children per node and uses Floyd's optimization for the sortdown: the element
+# moved to the root is not compared on the way down. The hole at the root is moved to a leaf along
+# the path of larger children, then the element is placed in the hole and swims back up. As the
+# element usually belongs near the bottom this takes roughly half the comparisons of a plain sink.
+# A 4-ary heap has half as many levels as a binary heap, which trades a few more comparisons for
+# fewer moves.
 ##
 
 import unittest
 import random
+import array as typed_array
 
+import buffers
+import key_sort
+import numpy_backend
 
-def sort(array):
-    n = len(array)
+
+# Sorts `array` in place. If a `key` function is given it is called once per element. If `reverse`
+# is true the array is sorted in descending order. The heap has `arity` children per node.
+#
+# Heapsort is not stable: elements which compare equal may be reordered. Sorting with a key is
+# stable as the elements are placed by `key_sort.py`.
+#
+# If NumPy is installed, NumPy arrays and numeric `array.array` instances are sorted in place by
+# the vectorized heapsort in `numpy_backend.py`, which uses the same arity.
+def sort(array, key=None, reverse=False, arity=2):
+    if arity < 2:
+        raise ValueError("arity must be at least 2")
+    if key is not None:
+        key_sort.sort_with_key(lambda keys: sort(keys, arity=arity), array, key, reverse)
+        return
+
+    view = numpy_backend.as_ndarray(array)
+    if view is not None:
+        numpy_backend.heapsort(view, arity)
+        if reverse:
+            numpy_backend.reverse(view)
+        return
+
+    dary_heapsort(array, 0, len(array) - 1, arity)
+    if reverse:
+        buffers.reverse(array)
+
+
+# Sorts the slice of `array` identified by the inclusive indices `low` and `high` using a max-heap
+# with `arity` children per node. The heap is rooted at `low`: the children of the element at index
+# `i` are at indices `arity * (i - low) + low + 1` onwards.
+def dary_heapsort(array, low, high, arity=2):
+    if high <= low:
+        return
+    d = arity
+    base = 1 - (d - 1) * low
+
+    # Heap construction, sinking each parent from the last upwards.
+    i = low + (high - low - 1) // d
+    while i >= low:
+        sink_hole(array, i, low, high + 1, d)
+        i -= 1
+
+    # Sortdown.
+    for end in range(high, low, -1):
+        item = array[end]
+        array[end] = array[low]
+
+        # Move the hole at the root down to a leaf, promoting the larger child at each level.
+        hole = low
+        child = d * hole + base
+        while child < end:
+            value = array[child]
+            if d == 2:
+                if child + 1 < end and value < array[child + 1]:
+                    child += 1
+                    value = array[child]
+            else:
+                for j in range(child + 1, min(child + d, end)):
+                    if value < array[j]:
+                        child = j
+                        value = array[j]
+            array[hole] = value
+            hole = child
+            child = d * hole + base
+
+        # Swim the item back up from the leaf.
+        while hole > low:
+            parent = low + (hole - low - 1) // d
+            value = array[parent]
+            if not value < item:
+                break
+            array[hole] = value
+            hole = parent
+        array[hole] = item
+
+
+# Sinks the element at index `i` of the heap in array[low..end) with `arity` children per node,
+# moving larger children up into the hole rather than swapping.
+def sink_hole(array, i, low, end, arity):
+    item = array[i]
+    base = 1 - (arity - 1) * low
+    child = arity * i + base
+    while child < end:
+        value = array[child]
+        for j in range(child + 1, min(child + arity, end)):
+            if value < array[j]:
+                child = j
+                value = array[j]
+        if not item < value:
+            break
+        array[i] = value
+        i = child
+        child = arity * i + base
+    array[i] = item
+
+
+# Sorts the slice of `array` identified by the inclusive indices `low` and `high`. The heap uses
+# 1-based indices: heap index `i` refers to the array element at `offset + i`.
+def heapsort(array, low, high):
+    n = high - low + 1
+    offset = low - 1
 
     # Heap construction.
     i = n // 2
     while i >= 1:
-        sink(array, i, n)
+        sink(array, i, n, offset)
         i -= 1
 
     # Sortdown.
     while n > 1:
-        swap(array, 1, n)
+        swap(array, 1, n, offset)
         n -= 1
-        sink(array, 1, n)
+        sink(array, 1, n, offset)
 
 
-def sink(array, i, n):
+def sink(array, i, n, offset=-1):
     while 2 * i <= n:
         j = 2 * i
-        if j < n and less(array, j, j + 1):
+        if j < n and less(array, j, j + 1, offset):
             j = j + 1
-        if not less(array, i, j):
+        if not less(array, i, j, offset):
             break
-        swap(array, i, j)
+        swap(array, i, j, offset)
         i = j
 
 
-def swap(array, p, q):
-    p -= 1
-    q -= 1
+def swap(array, p, q, offset=-1):
+    p += offset
+    q += offset
     array[p], array[q] = array[q], array[p]
 
 
-def less(array, p, q):
-    p -= 1
-    q -= 1
+def less(array, p, q, offset=-1):
+    p += offset
+    q += offset
     return array[p] < array[q]
 
 
@@ -64,6 +176,80 @@ class TestSort(unittest.TestCase):
         sort(test_array)
         self.assertTrue(is_sorted(test_array))
 
+    def test_key(self):
+        test_array = [random.randint(-500, 500) for i in range(1000)]
+        expected = sorted(test_array, key=abs)
+        sort(test_array, key=abs)
+        self.assertEqual(test_array, expected)
+
+    def test_reverse(self):
+        test_array = [random.randint(0, 50) for i in range(1000)]
+        expected = sorted(test_array, reverse=True)
+        sort(test_array, reverse=True)
+        self.assertEqual(test_array, expected)
+
+    def test_key_reverse(self):
+        test_array = [(random.randint(0, 20), i) for i in range(1000)]
+        expected = sorted(test_array, key=lambda pair: pair[0], reverse=True)
+        sort(test_array, key=lambda pair: pair[0], reverse=True)
+        self.assertEqual(test_array, expected)
+
+    def test_heapsort_slice(self):
+        test_array = [i for i in range(1000)]
+        random.shuffle(test_array)
+        expected = test_array[:100] + sorted(test_array[100:900]) + test_array[900:]
+        heapsort(test_array, 100, 899)
+        self.assertEqual(test_array, expected)
+
+    def test_arity(self):
+        for arity in [2, 3, 4, 8]:
+            for n in [0, 1, 2, 3, 10, 1000]:
+                test_array = [random.randint(0, n) for i in range(n)]
+                expected = sorted(test_array)
+                sort(test_array, arity=arity)
+                self.assertEqual(test_array, expected)
+        with self.assertRaises(ValueError):
+            sort([2, 1], arity=1)
+
+    def test_dary_heapsort_slice(self):
+        for arity in [2, 4]:
+            test_array = [random.random() for i in range(1000)]
+            expected = test_array[:100] + sorted(test_array[100:900]) + test_array[900:]
+            dary_heapsort(test_array, 100, 899, arity)
+            self.assertEqual(test_array, expected)
+
+    @unittest.skipIf(numpy_backend.numpy is None, "NumPy is not installed")
+    def test_numeric_arrays(self):
+        numpy = numpy_backend.numpy
+        test_array = numpy.array([random.random() for i in range(1000)])
+        expected = numpy.sort(test_array)
+        sort(test_array)
+        self.assertTrue(numpy.array_equal(test_array, expected))
+        test_array = typed_array.array('i', [random.randint(-100, 100) for i in range(1000)])
+        expected = sorted(test_array, reverse=True)
+        sort(test_array, reverse=True)
+        self.assertEqual(test_array.tolist(), expected)
+        for dtype in [numpy.float16, numpy.longdouble]:
+            test_array = numpy.array([random.random() for i in range(500)], dtype=dtype)
+            expected = numpy.sort(test_array)
+            sort(test_array, arity=3)
+            self.assertTrue(numpy.array_equal(test_array, expected))
+
+    def test_typed_buffers(self):
+        # With NumPy disabled the buffers are sorted in place by the pure Python implementation.
+        numpy = numpy_backend.numpy
+        numpy_backend.numpy = None
+        try:
+            values = [random.randint(-100, 100) for i in range(1000)]
+            test_array = typed_array.array('i', values)
+            sort(test_array, reverse=True)
+            self.assertEqual(test_array.tolist(), sorted(values, reverse=True))
+            test_array = buffers.memoryview_of('d', values)
+            sort(test_array)
+            self.assertEqual(test_array.tolist(), sorted(values))
+        finally:
+            numpy_backend.numpy = numpy
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+##
+# This module counts the operations performed by the sorting algorithms: comparisons, swaps, array
+# writes, copies into auxiliary arrays, and the maximum recursion depth.
+#
+# Counting is done from outside the algorithms. The input is replaced by a CountingArray, a list
+# whose elements are wrapped in Counted objects: each comparison between elements goes through a
+# Counted comparison method and each write goes through CountingArray.__setitem__. Recursion depth
+# is tracked by a profile hook installed only for the duration of the `counting()` block. The sort
+# modules themselves contain no counting code, so they run at full speed when not instrumented.
+#
+#   with instrument.counting() as counter:
+#       array = counter.wrap([3, 1, 2])
+#       heapsort.sort(array)
+#   print(counter.as_dict())
+#
+# Algorithms which inspect element values directly, such as radix sort, can't be instrumented.
+# Work done in worker processes is not counted. Algorithms which dispatch on the element types, such
+# as `auto_sort`, or on the array type, such as those with a NumPy path for typed buffers, take
+# their generic path for wrapped elements, so the counts only describe that path.
+##
+
+import unittest
+import random
+import sys
+import contextlib
+
+
+class Counter:
+
+    def __init__(self):
+        self.comparisons = 0
+        self.swaps = 0
+        self.writes = 0
+        self.aux_copies = 0
+        self.max_depth = 0
+
+    # Returns a CountingArray holding the elements of `array`, each wrapped in a Counted object.
+    def wrap(self, array):
+        return CountingArray([Counted(item, self) for item in array], self)
+
+    # Returns a list of the original elements in the current order of the wrapped `array`.
+    def unwrap(self, array):
+        return [item.value for item in list.__iter__(array)]
+
+    def as_dict(self):
+        return dict(comparisons=self.comparisons, swaps=self.swaps, writes=self.writes,
+            aux_copies=self.aux_copies, max_depth=self.max_depth)
+
+
+# Wraps a single element and counts every comparison made with it.
+class Counted:
+
+    __slots__ = ("value", "counter")
+
+    def __init__(self, value, counter):
+        self.value = value
+        self.counter = counter
+
+    def __lt__(self, other):
+        self.counter.comparisons += 1
+        return self.value < unwrap(other)
+
+    def __le__(self, other):
+        self.counter.comparisons += 1
+        return self.value <= unwrap(other)
+
+    def __gt__(self, other):
+        self.counter.comparisons += 1
+        return self.value > unwrap(other)
+
+    def __ge__(self, other):
+        self.counter.comparisons += 1
+        return self.value >= unwrap(other)
+
+    def __eq__(self, other):
+        self.counter.comparisons += 1
+        return self.value == unwrap(other)
+
+    def __ne__(self, other):
+        self.counter.comparisons += 1
+        return self.value != unwrap(other)
+
+    def __hash__(self):
+        return hash(self.value)
+
+    def __repr__(self):
+        return f"Counted({self.value!r})"
+
+
+def unwrap(item):
+    return item.value if isinstance(item, Counted) else item
+
+
+# A list which counts writes to its elements. An auxiliary array, created by copying or slicing a
+# counting array, counts writes as auxiliary copies instead. Two consecutive writes which exchange
+# the elements at two indices are also counted as a swap.
+class CountingArray(list):
+
+    def __init__(self, items, counter, is_aux=False):
+        super().__init__(items)
+        self.counter = counter
+        self.is_aux = is_aux
+        self.last_write = None
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            items = list.__getitem__(self, index)
+            self.counter.aux_copies += len(items)
+            return CountingArray(items, self.counter, True)
+        return list.__getitem__(self, index)
+
+    def __setitem__(self, index, value):
+        if isinstance(index, slice):
+            self.count_writes(len(range(*index.indices(len(self)))))
+            self.last_write = None
+            list.__setitem__(self, index, value)
+            return
+
+        old = list.__getitem__(self, index)
+        last = self.last_write
+        if last is not None and value is last[1] and list.__getitem__(self, last[0]) is old \
+            and last[0] != index:
+            self.counter.swaps += 1
+            self.last_write = None
+        else:
+            self.last_write = (index, old)
+        list.__setitem__(self, index, value)
+        self.count_writes(1)
+
+    def count_writes(self, n):
+        if self.is_aux:
+            self.counter.aux_copies += n
+        else:
+            self.counter.writes += n
+
+    def copy(self):
+        self.counter.aux_copies += len(self)
+        return CountingArray(self, self.counter, True)
+
+
+# Context manager which yields a new Counter and tracks the maximum recursion depth, i.e. the
+# largest number of simultaneously active calls of any one function, while the block runs.
+@contextlib.contextmanager
+def counting():
+    counter = Counter()
+    active = {}
+
+    def profile(frame, event, arg):
+        if event == "call":
+            code = frame.f_code
+            depth = active.get(code, 0) + 1
+            active[code] = depth
+            if depth > counter.max_depth:
+                counter.max_depth = depth
+        elif event == "return":
+            code = frame.f_code
+            if code in active:
+                active[code] -= 1
+
+    previous = sys.getprofile()
+    sys.setprofile(profile)
+    try:
+        yield counter
+    finally:
+        sys.setprofile(previous)
+
+
+# Runs `func` on an instrumented copy of `array` and returns the counts as a dictionary.
+def count(func, array):
+    with counting() as counter:
+        func(counter.wrap(array))
+    return counter.as_dict()
+
+
+class TestInstrument(unittest.TestCase):
+
+    def test_counts(self):
+        import heapsort
+        import mergesort
+        import quicksort_3way
+
+        test_array = [random.random() for i in range(500)]
+        with counting() as counter:
+            wrapped = counter.wrap(test_array)
+            mergesort.sort(wrapped)
+        self.assertEqual(counter.unwrap(wrapped), sorted(test_array))
+        self.assertGreater(counter.comparisons, 0)
+        self.assertGreater(counter.writes, 0)
+        self.assertGreater(counter.aux_copies, 0)
+        self.assertGreaterEqual(counter.max_depth, 9)
+
+        counts = count(heapsort.sort, test_array)
+        self.assertGreater(counts["swaps"], 0)
+        self.assertEqual(counts["aux_copies"], 0)
+
+        counts = count(quicksort_3way.sort, test_array)
+        self.assertGreater(counts["max_depth"], 1)
+
+    def test_swap_detection(self):
+        counter = Counter()
+        array = counter.wrap([1, 2, 3])
+        array[0], array[2] = array[2], array[0]
+        array[1] = array[0]
+        self.assertEqual(counter.swaps, 1)
+        self.assertEqual(counter.writes, 3)
+        self.assertEqual(counter.unwrap(array), [3, 3, 1])
+
+    def test_comparisons(self):
+        counter = Counter()
+        a, b = counter.wrap([1, 2])
+        self.assertTrue(a < b)
+        self.assertFalse(a >= b)
+        self.assertTrue(a < 5)
+        self.assertEqual(counter.comparisons, 3)
+
+    def test_profile_restored(self):
+        with counting():
+            pass
+        self.assertIsNone(sys.getprofile())
+
+
+if __name__ == '__main__':
+    unittest.main()
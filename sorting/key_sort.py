@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+##
+# This module contains the key function support shared by the sort modules.
+#
+# The key of each element is computed exactly once and stored in a parallel array. The array of keys
+# is sorted by the chosen algorithm, so the algorithm's inner loops compare plain key values rather
+# than calling the key function or a wrapper's __lt__ method. Each element is then written to the
+# next free slot in the block of the sorted keys that matches its own key. Elements are placed in
+# their original order, so sorting by key is stable whichever algorithm sorted the keys.
+##
+
+import unittest
+import random
+import bisect
+
+import buffers
+
+
+# Sorts `array` in place by `key` using the function `sort` to sort a list of keys in ascending
+# order. If `reverse` is true the array is sorted in descending order; elements with equal keys
+# still keep their original relative order.
+def sort_with_key(sort, array, key, reverse=False):
+    keys = [key(item) for item in array]
+    sorted_keys = keys.copy()
+    sort(sorted_keys)
+
+    n = len(keys)
+    items = list(array)
+    placed = bytearray(n)
+
+    # Maps the first slot of each block of equal keys to the next free slot in that block.
+    next_slot = {}
+
+    for i in range(n):
+        if reverse:
+            start = n - bisect.bisect_right(sorted_keys, keys[i])
+        else:
+            start = bisect.bisect_left(sorted_keys, keys[i])
+        slot = next_slot.get(start, start)
+        if slot >= n or placed[slot]:
+            buffers.assign(array, items)
+            raise ValueError("sort keys are not totally ordered")
+        placed[slot] = 1
+        next_slot[start] = slot + 1
+        array[slot] = items[i]
+
+
+class TestKeySort(unittest.TestCase):
+
+    def test_key(self):
+        test_array = [random.randint(-100, 100) for i in range(1000)]
+        expected = sorted(test_array, key=abs)
+        sort_with_key(lambda keys: keys.sort(), test_array, abs)
+        self.assertEqual(test_array, expected)
+
+    def test_key_is_stable(self):
+        test_array = [(random.randint(0, 10), i) for i in range(1000)]
+        expected = sorted(test_array, key=lambda pair: pair[0])
+        sort_with_key(lambda keys: keys.sort(), test_array, lambda pair: pair[0])
+        self.assertEqual(test_array, expected)
+
+    def test_key_reverse_is_stable(self):
+        test_array = [(random.randint(0, 10), i) for i in range(1000)]
+        expected = sorted(test_array, key=lambda pair: pair[0], reverse=True)
+        sort_with_key(lambda keys: keys.sort(), test_array, lambda pair: pair[0], reverse=True)
+        self.assertEqual(test_array, expected)
+
+    def test_key_called_once(self):
+        calls = []
+        test_array = [random.random() for i in range(100)]
+        expected = sorted(test_array)
+        sort_with_key(lambda keys: keys.sort(), test_array, lambda x: calls.append(x) or x)
+        self.assertEqual(test_array, expected)
+        self.assertEqual(len(calls), 100)
+
+    def test_unordered_keys(self):
+        nan = float("nan")
+        test_array = [3.0, nan, 1.0, nan, 2.0]
+        with self.assertRaises(ValueError):
+            sort_with_key(lambda keys: keys.sort(), test_array, lambda x: x)
+        self.assertEqual(sorted(test_array, key=str), sorted([3.0, nan, 1.0, nan, 2.0], key=str))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+##
+# This module contains a lazy version of `sorted()` which returns a generator. The input is copied
+# into a binary min-heap, built bottom-up in O(n) time, and each item is popped from the heap only
+# when the consumer asks for it. The first item costs O(n) and each further item O(log n), so a
+# consumer which takes the first k of n items pays O(n + k log n) rather than O(n log n).
+#
+# The heap routines are the min-heap counterparts of `heapsort.sink_hole()` and the sortdown step
+# of `heapsort.dary_heapsort()`: elements move through a hole rather than being swapped, and each
+# pop sinks the hole at the root to a leaf before the last element swims back up into it.
+##
+
+import unittest
+import random
+import itertools
+
+
+# Returns a generator which yields the items of `iterable` in ascending order. If a `key` function
+# is given it is called once per item, and items with equal keys are yielded in their original
+# order. Without a key, items which compare equal may be yielded in any order.
+#
+# The whole input is consumed on the first call to next().
+def lazy_sorted(iterable, key=None):
+    if key is None:
+        heap = list(iterable)
+    else:
+        items = list(iterable)
+        heap = [(key(item), i) for i, item in enumerate(items)]
+
+    n = len(heap)
+    for i in range(n // 2 - 1, -1, -1):
+        sink(heap, i, n)
+
+    while heap:
+        top = pop(heap)
+        yield top if key is None else items[top[1]]
+
+
+# Sinks the element at index `i` of the min-heap heap[0..n).
+def sink(heap, i, n):
+    item = heap[i]
+    child = 2 * i + 1
+    while child < n:
+        value = heap[child]
+        if child + 1 < n and heap[child + 1] < value:
+            child += 1
+            value = heap[child]
+        if not value < item:
+            break
+        heap[i] = value
+        i = child
+        child = 2 * i + 1
+    heap[i] = item
+
+
+# Removes and returns the smallest element of the non-empty min-heap `heap`.
+def pop(heap):
+    last = heap.pop()
+    n = len(heap)
+    if n == 0:
+        return last
+    top = heap[0]
+
+    # Move the hole at the root down to a leaf, promoting the smaller child at each level.
+    hole = 0
+    child = 1
+    while child < n:
+        value = heap[child]
+        if child + 1 < n and heap[child + 1] < value:
+            child += 1
+            value = heap[child]
+        heap[hole] = value
+        hole = child
+        child = 2 * hole + 1
+
+    # Swim the last element back up from the leaf.
+    while hole > 0:
+        parent = (hole - 1) // 2
+        value = heap[parent]
+        if not last < value:
+            break
+        heap[hole] = value
+        hole = parent
+    heap[hole] = last
+    return top
+
+
+class TestLazySorted(unittest.TestCase):
+
+    def test_sorted(self):
+        for n in [0, 1, 2, 3, 10, 1000]:
+            test_array = [random.randint(0, n) for i in range(n)]
+            self.assertEqual(list(lazy_sorted(test_array)), sorted(test_array))
+
+    def test_iterable(self):
+        test_array = [random.random() for i in range(1000)]
+        self.assertEqual(list(lazy_sorted(x for x in test_array)), sorted(test_array))
+        self.assertEqual(list(lazy_sorted(range(10, 0, -1))), list(range(1, 11)))
+
+    def test_first_k(self):
+        test_array = [random.random() for i in range(1000)]
+        first = list(itertools.islice(lazy_sorted(test_array), 10))
+        self.assertEqual(first, sorted(test_array)[:10])
+
+    def test_key_is_stable(self):
+        test_array = [(random.randint(0, 10), i) for i in range(1000)]
+        expected = sorted(test_array, key=lambda pair: pair[0])
+        self.assertEqual(list(lazy_sorted(test_array, key=lambda pair: pair[0])), expected)
+
+    def test_key_called_once(self):
+        calls = []
+        test_array = [random.random() for i in range(100)]
+        result = lazy_sorted(test_array, key=lambda x: calls.append(x) or x)
+        self.assertEqual(len(calls), 0)
+        self.assertEqual(next(result), min(test_array))
+        self.assertEqual(len(calls), 100)
+
+    def test_input_unchanged(self):
+        test_array = [random.random() for i in range(100)]
+        copy = test_array.copy()
+        list(lazy_sorted(test_array))
+        self.assertEqual(test_array, copy)
+
+
+if __name__ == '__main__':
+    unittest.main()
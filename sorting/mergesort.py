@@ -1,14 +1,94 @@
 #!/usr/bin/env python3
 ##
 # This module contains a reference implementation of the top-down mergesort algorithm.
+#
+# It also contains an adaptive 'natural' mergesort in the style of Timsort which merges the runs
+# already present in the input. This runs in O(n) time on input which is already sorted in
+# ascending or descending order.
+#
+# The 'pingpong' mode is a top-down mergesort which never copies a slice into the auxiliary array
+# before merging it. The array and the auxiliary array swap roles at each level of the recursion:
+# each half is sorted into one buffer and the halves are merged into the other.
+#
+# The 'lean' mode is a top-down mergesort which uses a buffer of only about sqrt(n) elements rather
+# than a full-length copy of the array. Two runs are merged through the buffer if the shorter of
+# them fits in it. Otherwise the longer run is split at its middle element, the matching split
+# point in the other run is found by binary search, and rotating the two middle blocks leaves two
+# smaller merges to do (as in the adaptive merge of `std::stable_sort`). Blocks are moved in chunks
+# no longer than the buffer, so the extra memory stays O(sqrt(n)) plus an O(log n) stack, at the
+# cost of O(n log^2 n) element moves in the worst case.
+#
+# `merge_batch()` merges a small unsorted batch into a large sorted array without re-sorting it.
 ##
 
 import unittest
 import random
+import array as typed_array
+import bisect
+import math
 
+import buffers
+import key_sort
+import numpy_backend
 
-def sort(array):
-    mergesort(array, array.copy(), 0, len(array) - 1)
+
+# Runs shorter than this are extended using binary insertion sort. (The actual minimum run length
+# used lies between MIN_MERGE/2 and MIN_MERGE, chosen so the number of runs is close to a power of 2.)
+MIN_MERGE = 64
+
+# Number of consecutive wins for one run before a merge switches into galloping mode.
+MIN_GALLOP = 7
+
+# In 'pingpong' and 'lean' modes slices of this length or shorter are sorted using binary
+# insertion sort.
+INSERTION_CUTOFF = 12
+
+MODES = ("topdown", "natural", "pingpong", "lean")
+
+
+# Sorts `array` in place. The `mode` is 'topdown' for the standard top-down mergesort, 'natural'
+# for the adaptive natural mergesort, 'pingpong' for the top-down mergesort with alternating
+# buffers, or 'lean' for the top-down mergesort with an O(sqrt(n)) buffer. If a `key` function is
+# given it is called once per element (see `key_sort.py`). If `reverse` is true the array is sorted
+# in descending order.
+#
+# All modes are stable: elements which compare equal keep their original relative order, with or
+# without a key and in either direction. The 'lean' mode trades speed for memory; the other modes
+# allocate scratch space of up to n elements. (Sorting by key always stores n keys.)
+#
+# If NumPy is installed, NumPy arrays and numeric `array.array` instances are sorted in place by
+# the vectorized bottom-up mergesort in `numpy_backend.py`, which is also stable. This allocates a
+# full-length copy so it isn't used in 'lean' mode.
+def sort(array, mode="topdown", key=None, reverse=False):
+    if mode not in MODES:
+        raise ValueError(f"unknown mergesort mode: {mode!r}")
+
+    if key is not None:
+        key_sort.sort_with_key(lambda keys: sort(keys, mode), array, key, reverse)
+        return
+
+    view = numpy_backend.as_ndarray(array) if mode != "lean" else None
+    if view is not None:
+        if reverse:
+            numpy_backend.reverse(view)
+        numpy_backend.mergesort(view)
+        if reverse:
+            numpy_backend.reverse(view)
+        return
+
+    if reverse:
+        # Reversing before and after the sort keeps equal elements in their original order.
+        buffers.reverse(array)
+        sort(array, mode)
+        buffers.reverse(array)
+    elif mode == "topdown":
+        mergesort(array, buffers.copy(array), 0, len(array) - 1)
+    elif mode == "pingpong":
+        pingpong_mergesort(array)
+    elif mode == "lean":
+        lean_mergesort(array)
+    else:
+        NaturalMergesort(array).sort()
 
 
 # Sorts the slice of `array` identified by the inclusive indices `low` and `high`. The auxiliary
@@ -45,6 +125,490 @@ def merge(array, aux_array, low, mid, high):
             i += 1
 
 
+# Merges the elements of `batch` into the sorted array `array`, which grows in place and must
+# support `extend()`, e.g. a list or an `array.array`. The batch is sorted first. Working from the
+# back, the insertion point of each batch element is found by galloping leftwards from the previous
+# one and the block of `array` above it is moved up in one slice assignment. This takes O(k log k +
+# k log(n/k)) comparisons for a batch of k elements.
+#
+# As in merge(), the result is stable: each batch element goes after any elements of `array` which
+# compare equal to it, and equal batch elements keep their relative order.
+def merge_batch(array, batch):
+    batch = list(batch)
+    sort(batch, mode="natural")
+    n, k = len(array), len(batch)
+    if k == 0:
+        return
+    array.extend(batch)
+
+    # The unmerged elements are array[0..i) and batch[0..j).
+    i, j = n, k
+    while j > 0 and i > 0:
+        item = batch[j - 1]
+        p = gallop_right(item, array, 0, i, True)
+        array[p + j:i + j] = array[p:i]
+        array[p + j - 1] = item
+        i, j = p, j - 1
+    buffers.assign(array, batch[:j])
+
+
+# Sorts `array` in place using a top-down mergesort with alternating buffers. Slices of length
+# `cutoff` or shorter are sorted using binary insertion sort.
+def pingpong_mergesort(array, cutoff=INSERTION_CUTOFF):
+    if len(array) < 2:
+        return
+    pingpong_sort(buffers.copy(array), array, 0, len(array) - 1, cutoff)
+
+
+# Sorts the slice src[low..high] into dst[low..high]. On entry both slices hold the same elements;
+# on exit the contents of the slice of `src` are unspecified. (Indices are inclusive.)
+def pingpong_sort(src, dst, low, high, cutoff):
+    if high - low < cutoff:
+        binary_insertion_sort(dst, low, high + 1, low + 1)
+        return
+    if high <= low:
+        return
+    mid = low + (high - low) // 2
+
+    # Sort each half of `dst` into `src`, then merge the halves back into `dst`.
+    pingpong_sort(dst, src, low, mid, cutoff)
+    pingpong_sort(dst, src, mid + 1, high, cutoff)
+
+    # The halves are already in order if the last element of the left half is not greater than
+    # the first element of the right half.
+    if not src[mid + 1] < src[mid]:
+        dst[low:high + 1] = src[low:high + 1]
+        return
+    pingpong_merge(src, dst, low, mid, high)
+
+
+# Merges the sorted slices src[low..mid] and src[mid+1..high] into dst[low..high].
+def pingpong_merge(src, dst, low, mid, high):
+    i, j = low, mid + 1
+    a, b = src[i], src[j]
+    k = low
+    while True:
+        if b < a:
+            dst[k] = b
+            k += 1
+            j += 1
+            if j > high:
+                dst[k:high + 1] = src[i:mid + 1]
+                return
+            b = src[j]
+        else:
+            dst[k] = a
+            k += 1
+            i += 1
+            if i > mid:
+                dst[k:high + 1] = src[j:high + 1]
+                return
+            a = src[i]
+
+
+# Sorts `array` in place using a top-down mergesort with a buffer of `buffer_size` elements, by
+# default about sqrt(n). Slices of length `cutoff` or shorter are sorted using binary insertion sort.
+def lean_mergesort(array, buffer_size=None, cutoff=INSERTION_CUTOFF):
+    n = len(array)
+    if n < 2:
+        return
+    if buffer_size is None:
+        buffer_size = math.isqrt(n)
+    buffer = buffers.copy(array, 0, max(buffer_size, 1))
+    lean_sort(array, buffer, 0, n, cutoff)
+
+
+# Sorts the slice array[low..high) using `buffer` as scratch space.
+def lean_sort(array, buffer, low, high, cutoff):
+    if high - low <= max(cutoff, 1):
+        binary_insertion_sort(array, low, high, low + 1)
+        return
+    mid = low + (high - low) // 2
+    lean_sort(array, buffer, low, mid, cutoff)
+    lean_sort(array, buffer, mid, high, cutoff)
+    lean_merge(array, buffer, low, mid, high)
+
+
+# Merges the sorted slices array[low..mid) and array[mid..high) in place using `buffer` as scratch
+# space. If neither run fits in the buffer the longer run is cut at its middle element and the other
+# run at the matching position, so that array[cut_1..mid) and array[mid..cut_2) can be swapped by a
+# rotation. Equal elements are never moved past each other: a cut in the left run falls after the
+# elements equal to the right run's cut element, and a cut in the right run before them.
+def lean_merge(array, buffer, low, mid, high):
+    size = len(buffer)
+    while low < mid < high and array[mid] < array[mid - 1]:
+        length_a, length_b = mid - low, high - mid
+        if length_a <= size:
+            lean_merge_lo(array, buffer, low, mid, high)
+            return
+        if length_b <= size:
+            lean_merge_hi(array, buffer, low, mid, high)
+            return
+        if length_a >= length_b:
+            cut_1 = low + length_a // 2
+            cut_2 = bisect.bisect_left(array, array[cut_1], mid, high)
+        else:
+            cut_2 = mid + length_b // 2
+            cut_1 = bisect.bisect_right(array, array[cut_2], low, mid)
+        rotate(array, buffer, cut_1, mid, cut_2)
+        new_mid = cut_1 + (cut_2 - mid)
+
+        # Recurse on the shorter side and loop on the longer to keep the stack O(log n).
+        if new_mid - low < high - new_mid:
+            lean_merge(array, buffer, low, cut_1, new_mid)
+            low, mid = new_mid, cut_2
+        else:
+            lean_merge(array, buffer, new_mid, cut_2, high)
+            mid, high = cut_1, new_mid
+
+
+# Merges array[low..mid) and array[mid..high) from the left, given that the left run fits in
+# `buffer`.
+def lean_merge_lo(array, buffer, low, mid, high):
+    length_a = mid - low
+    buffer[0:length_a] = array[low:mid]
+    i, j, k = 0, mid, low
+    while i < length_a and j < high:
+        if array[j] < buffer[i]:
+            array[k] = array[j]
+            j += 1
+        else:
+            array[k] = buffer[i]
+            i += 1
+        k += 1
+    array[k:k + length_a - i] = buffer[i:length_a]
+
+
+# Merges array[low..mid) and array[mid..high) from the right, given that the right run fits in
+# `buffer`.
+def lean_merge_hi(array, buffer, low, mid, high):
+    length_b = high - mid
+    buffer[0:length_b] = array[mid:high]
+    i, j, k = mid - 1, length_b - 1, high - 1
+    while i >= low and j >= 0:
+        if buffer[j] < array[i]:
+            array[k] = array[i]
+            i -= 1
+        else:
+            array[k] = buffer[j]
+            j -= 1
+        k -= 1
+    array[low:low + j + 1] = buffer[0:j + 1]
+
+
+# Swaps the adjacent blocks array[low..mid) and array[mid..high) in place. The shorter block is
+# parked in `buffer` if it fits; otherwise the rotation is done by three reversals. No temporary
+# copy is longer than the buffer.
+def rotate(array, buffer, low, mid, high):
+    length_a, length_b = mid - low, high - mid
+    if length_a == 0 or length_b == 0:
+        return
+    size = len(buffer)
+    if length_a <= size:
+        buffer[0:length_a] = array[low:mid]
+        for start in range(mid, high, size):
+            end = min(start + size, high)
+            array[start - length_a:end - length_a] = buffers.copy(array, start, end)
+        array[high - length_a:high] = buffer[0:length_a]
+    elif length_b <= size:
+        buffer[0:length_b] = array[mid:high]
+        for end in range(mid, low, -size):
+            start = max(end - size, low)
+            array[start + length_b:end + length_b] = buffers.copy(array, start, end)
+        array[low:low + length_b] = buffer[0:length_b]
+    else:
+        reverse_slice(array, low, mid, size)
+        reverse_slice(array, mid, high, size)
+        reverse_slice(array, low, high, size)
+
+
+# Reverses array[low..high) in place by swapping chunks of up to `size` elements from each end.
+def reverse_slice(array, low, high, size):
+    while high - low > 1:
+        step = min(size, (high - low) // 2)
+        left = buffers.copy(array, low, low + step)
+        right = buffers.copy(array, high - step, high)
+        array[low:low + step] = right[::-1]
+        array[high - step:high] = left[::-1]
+        low += step
+        high -= step
+
+
+# Adaptive mergesort which identifies the ascending and descending runs in the input and merges
+# them using a stack of pending runs. Merges skip the elements which are already in their final
+# positions and switch into a galloping mode when one run is consistently winning.
+class NaturalMergesort:
+
+    def __init__(self, array):
+        self.array = array
+        self.min_gallop = MIN_GALLOP
+        # Stack of pending runs as [start, length] pairs.
+        self.runs = []
+
+    def sort(self):
+        array = self.array
+        n = len(array)
+        if n < 2:
+            return
+
+        min_run = min_run_length(n)
+        low = 0
+        while low < n:
+            run_length = count_run(array, low, n)
+            if run_length < min_run:
+                forced = min(min_run, n - low)
+                binary_insertion_sort(array, low, low + forced, low + run_length)
+                run_length = forced
+            self.runs.append([low, run_length])
+            self.merge_collapse()
+            low += run_length
+
+        self.merge_force_collapse()
+
+    # Merges runs on the stack until the lengths of the top three runs satisfy the invariants
+    # A > B + C and B > C. This keeps the run lengths balanced and the stack short.
+    def merge_collapse(self):
+        runs = self.runs
+        while len(runs) > 1:
+            n = len(runs) - 2
+            if (n > 0 and runs[n - 1][1] <= runs[n][1] + runs[n + 1][1]) or \
+                (n > 1 and runs[n - 2][1] <= runs[n - 1][1] + runs[n][1]):
+                if runs[n - 1][1] < runs[n + 1][1]:
+                    n -= 1
+            elif runs[n][1] > runs[n + 1][1]:
+                break
+            self.merge_at(n)
+
+    # Merges all the runs remaining on the stack.
+    def merge_force_collapse(self):
+        runs = self.runs
+        while len(runs) > 1:
+            n = len(runs) - 2
+            if n > 0 and runs[n - 1][1] < runs[n + 1][1]:
+                n -= 1
+            self.merge_at(n)
+
+    # Merges the adjacent runs at stack indices `i` and `i + 1`.
+    def merge_at(self, i):
+        array = self.array
+        start_a, length_a = self.runs[i]
+        start_b, length_b = self.runs[i + 1]
+        self.runs[i][1] = length_a + length_b
+        del self.runs[i + 1]
+
+        # Nothing to do if the runs are already in order.
+        if not array[start_b] < array[start_b - 1]:
+            return
+
+        # Elements of A which are not greater than B[0] are already in place.
+        k = gallop_right(array[start_b], array, start_a, start_b, False)
+        length_a -= k - start_a
+        start_a = k
+
+        # Elements of B which are not less than the last element of A are already in place.
+        length_b = gallop_left(array[start_b - 1], array, start_b, start_b + length_b, True) - start_b
+
+        if length_a <= length_b:
+            self.merge_lo(start_a, length_a, start_b, length_b)
+        else:
+            self.merge_hi(start_a, length_a, start_b, length_b)
+
+    # Merges the run A with the longer run B which follows it, working from the left. Only A is
+    # copied to scratch space.
+    def merge_lo(self, start_a, length_a, start_b, length_b):
+        array = self.array
+        temp = buffers.copy(array, start_a, start_a + length_a)
+        i, j, k = 0, start_b, start_a
+        end_b = start_b + length_b
+        min_gallop = self.min_gallop
+
+        while i < length_a and j < end_b:
+            # One element at a time until one run wins `min_gallop` times in a row.
+            count_a = count_b = 0
+            while i < length_a and j < end_b:
+                if array[j] < temp[i]:
+                    array[k] = array[j]
+                    j += 1
+                    count_a, count_b = 0, count_b + 1
+                else:
+                    array[k] = temp[i]
+                    i += 1
+                    count_a, count_b = count_a + 1, 0
+                k += 1
+                if count_a >= min_gallop or count_b >= min_gallop:
+                    break
+
+            # Galloping mode: find and move whole blocks while the blocks stay long.
+            while i < length_a and j < end_b:
+                p = gallop_right(array[j], temp, i, length_a, False)
+                count_a = p - i
+                array[k:k + count_a] = temp[i:p]
+                k += count_a
+                i = p
+                if i == length_a:
+                    break
+                array[k] = array[j]
+                k += 1
+                j += 1
+                if j == end_b:
+                    break
+
+                p = gallop_left(temp[i], array, j, end_b, False)
+                count_b = p - j
+                array[k:k + count_b] = array[j:p]
+                k += count_b
+                j = p
+                if j == end_b:
+                    break
+                array[k] = temp[i]
+                k += 1
+                i += 1
+
+                min_gallop = max(min_gallop - 1, 1)
+                if count_a < MIN_GALLOP and count_b < MIN_GALLOP:
+                    min_gallop += 2
+                    break
+
+        array[k:k + length_a - i] = temp[i:length_a]
+        self.min_gallop = min_gallop
+
+    # Merges the run A with the shorter run B which follows it, working from the right. Only B is
+    # copied to scratch space.
+    def merge_hi(self, start_a, length_a, start_b, length_b):
+        array = self.array
+        temp = buffers.copy(array, start_b, start_b + length_b)
+        i, j, k = start_a + length_a - 1, length_b - 1, start_b + length_b - 1
+        min_gallop = self.min_gallop
+
+        while i >= start_a and j >= 0:
+            count_a = count_b = 0
+            while i >= start_a and j >= 0:
+                if temp[j] < array[i]:
+                    array[k] = array[i]
+                    i -= 1
+                    count_a, count_b = count_a + 1, 0
+                else:
+                    array[k] = temp[j]
+                    j -= 1
+                    count_a, count_b = 0, count_b + 1
+                k -= 1
+                if count_a >= min_gallop or count_b >= min_gallop:
+                    break
+
+            while i >= start_a and j >= 0:
+                p = gallop_right(temp[j], array, start_a, i + 1, True)
+                count_a = i + 1 - p
+                array[k - count_a + 1:k + 1] = array[p:i + 1]
+                k -= count_a
+                i = p - 1
+                if i < start_a:
+                    break
+                array[k] = temp[j]
+                k -= 1
+                j -= 1
+                if j < 0:
+                    break
+
+                p = gallop_left(array[i], temp, 0, j + 1, True)
+                count_b = j + 1 - p
+                array[k - count_b + 1:k + 1] = temp[p:j + 1]
+                k -= count_b
+                j = p - 1
+                if j < 0:
+                    break
+                array[k] = array[i]
+                k -= 1
+                i -= 1
+
+                min_gallop = max(min_gallop - 1, 1)
+                if count_a < MIN_GALLOP and count_b < MIN_GALLOP:
+                    min_gallop += 2
+                    break
+
+        array[start_a:start_a + j + 1] = temp[0:j + 1]
+        self.min_gallop = min_gallop
+
+
+# Returns the minimum run length for an array of length `n`.
+def min_run_length(n):
+    r = 0
+    while n >= MIN_MERGE:
+        r |= n & 1
+        n >>= 1
+    return n + r
+
+
+# Returns the length of the run beginning at index `low`. A strictly descending run is reversed in
+# place. (Strictness is required to keep the sort stable.)
+def count_run(array, low, high):
+    run_end = low + 1
+    if run_end == high:
+        return 1
+    if array[run_end] < array[low]:
+        while run_end < high and array[run_end] < array[run_end - 1]:
+            run_end += 1
+        array[low:run_end] = array[low:run_end][::-1]
+    else:
+        while run_end < high and not array[run_end] < array[run_end - 1]:
+            run_end += 1
+    return run_end - low
+
+
+# Sorts the slice array[low..high) given that array[low..start) is already sorted, using a binary
+# search to find each insertion point.
+def binary_insertion_sort(array, low, high, start):
+    for i in range(start, high):
+        pivot = array[i]
+        pos = bisect.bisect_right(array, pivot, low, i)
+        array[pos + 1:i + 1] = array[pos:i]
+        array[pos] = pivot
+
+
+# Returns the leftmost index in the sorted slice array[low..high) at which `key` could be inserted,
+# i.e. the index of the first element not less than `key`. The search probes exponentially from the
+# left end, or from the right end if `from_right` is true, before finishing with a binary search.
+def gallop_left(key, array, low, high, from_right):
+    left, right = low, high
+    step = 1
+    if from_right:
+        p = high - 1
+        while p >= low and not array[p] < key:
+            right = p
+            p -= step
+            step *= 2
+        left = max(p + 1, low)
+    else:
+        p = low
+        while p < high and array[p] < key:
+            left = p + 1
+            p += step
+            step *= 2
+        right = min(p, high)
+    return bisect.bisect_left(array, key, left, right)
+
+
+# As gallop_left() but returns the rightmost insertion index, i.e. the index of the first element
+# greater than `key`.
+def gallop_right(key, array, low, high, from_right):
+    left, right = low, high
+    step = 1
+    if from_right:
+        p = high - 1
+        while p >= low and key < array[p]:
+            right = p
+            p -= step
+            step *= 2
+        left = max(p + 1, low)
+    else:
+        p = low
+        while p < high and not key < array[p]:
+            left = p + 1
+            p += step
+            step *= 2
+        right = min(p, high)
+    return bisect.bisect_right(array, key, left, right)
+
+
 # Returns true if the input is empty, of length 1, or sorted in ascending order.
 def is_sorted(array):
     for index in range(1, len(array)):
@@ -62,6 +626,164 @@ class TestSort(unittest.TestCase):
         sort(test_array)
         self.assertTrue(is_sorted(test_array))
 
+    def test_key(self):
+        test_array = [random.randint(-500, 500) for i in range(1000)]
+        expected = sorted(test_array, key=abs)
+        sort(test_array, key=abs)
+        self.assertEqual(test_array, expected)
+
+    def test_reverse(self):
+        test_array = [random.randint(0, 50) for i in range(1000)]
+        expected = sorted(test_array, reverse=True)
+        sort(test_array, reverse=True)
+        self.assertEqual(test_array, expected)
+
+    def test_key_reverse(self):
+        test_array = [(random.randint(0, 20), i) for i in range(1000)]
+        expected = sorted(test_array, key=lambda pair: pair[0], reverse=True)
+        sort(test_array, key=lambda pair: pair[0], reverse=True)
+        self.assertEqual(test_array, expected)
+
+    def test_reverse_is_stable(self):
+        for mode in MODES:
+            test_array = [Record(random.randint(0, 20), i) for i in range(1000)]
+            expected = [(r.key, r.tag) for r in sorted(test_array, key=lambda r: r.key, reverse=True)]
+            sort(test_array, mode=mode, reverse=True)
+            self.assertEqual([(r.key, r.tag) for r in test_array], expected)
+
+    def test_pingpong(self):
+        for n in [0, 1, 2, 12, 13, 14, 100, 1000, 5000]:
+            test_array = [random.randint(0, n) for i in range(n)]
+            sort(test_array, mode="pingpong")
+            self.assertTrue(is_sorted(test_array))
+        for cutoff in [0, 1, 4, 32]:
+            test_array = [random.random() for i in range(1000)]
+            pingpong_mergesort(test_array, cutoff)
+            self.assertTrue(is_sorted(test_array))
+        test_array = [i for i in range(5000)]
+        sort(test_array, mode="pingpong")
+        self.assertEqual(test_array, [i for i in range(5000)])
+
+    def test_pingpong_is_stable(self):
+        test_array = [Record(random.randint(0, 20), i) for i in range(3000)]
+        sort(test_array, mode="pingpong")
+        self.assertEqual([(r.key, r.tag) for r in test_array],
+            sorted((r.key, r.tag) for r in test_array))
+
+    def test_lean(self):
+        for n in [0, 1, 2, 12, 13, 100, 1000, 5000]:
+            test_array = [random.randint(0, n) for i in range(n)]
+            expected = sorted(test_array)
+            sort(test_array, mode="lean")
+            self.assertEqual(test_array, expected)
+        # Small buffers force the rotation path, including rotations by reversal.
+        for buffer_size in [1, 2, 5, 100]:
+            for cutoff in [0, 1, 12]:
+                test_array = [Record(random.randint(0, 20), i) for i in range(1000)]
+                lean_mergesort(test_array, buffer_size, cutoff)
+                self.assertEqual([(r.key, r.tag) for r in test_array],
+                    sorted((r.key, r.tag) for r in test_array))
+
+    def test_rotate(self):
+        for size in [1, 3, 10]:
+            for n in range(8):
+                for mid in range(n + 1):
+                    test_array = [i for i in range(n)]
+                    rotate(test_array, [None] * size, 0, mid, n)
+                    self.assertEqual(test_array, [i for i in range(mid, n)] + [i for i in range(mid)])
+
+    def test_merge_batch(self):
+        for n, k in [(0, 0), (0, 10), (10, 0), (1000, 1), (1000, 30), (100, 1000)]:
+            test_array = sorted(random.randint(0, 500) for i in range(n))
+            batch = [random.randint(-10, 510) for i in range(k)]
+            expected = sorted(test_array + batch)
+            merge_batch(test_array, batch)
+            self.assertEqual(test_array, expected)
+        test_array = typed_array.array('i', range(0, 100, 2))
+        merge_batch(test_array, [51, 3, 100, -1])
+        self.assertEqual(test_array.tolist(), sorted(list(range(0, 100, 2)) + [51, 3, 100, -1]))
+
+    def test_merge_batch_is_stable(self):
+        test_array = [Record(random.randint(0, 20), i) for i in range(1000)]
+        test_array.sort(key=lambda r: r.key)
+        batch = [Record(random.randint(0, 20), i) for i in range(1000, 1100)]
+        expected = sorted(test_array + batch, key=lambda r: r.key)
+        merge_batch(test_array, batch)
+        self.assertEqual([r.tag for r in test_array], [r.tag for r in expected])
+
+    def test_natural_random(self):
+        for n in [0, 1, 2, 63, 64, 65, 1000, 5000]:
+            test_array = [random.randint(0, n) for i in range(n)]
+            expected = sorted(test_array)
+            sort(test_array, mode="natural")
+            self.assertEqual(test_array, expected)
+
+    def test_natural_presorted(self):
+        test_array = [i for i in range(5000)]
+        sort(test_array, mode="natural")
+        self.assertEqual(test_array, [i for i in range(5000)])
+        test_array = [i for i in range(5000, 0, -1)]
+        sort(test_array, mode="natural")
+        self.assertEqual(test_array, [i for i in range(1, 5001)])
+
+    def test_natural_runs(self):
+        # Interleaved ascending and descending runs of varying lengths exercise galloping.
+        test_array = []
+        for i in range(200):
+            run = [random.randint(0, 10000) for j in range(random.randint(1, 300))]
+            test_array.extend(sorted(run, reverse=random.random() < 0.5))
+        expected = sorted(test_array)
+        sort(test_array, mode="natural")
+        self.assertEqual(test_array, expected)
+
+    def test_natural_is_stable(self):
+        test_array = [Record(random.randint(0, 20), i) for i in range(3000)]
+        test_array[1000:2000] = sorted(test_array[1000:2000], key=lambda r: r.key)
+        sort(test_array, mode="natural")
+        self.assertEqual([(r.key, r.tag) for r in test_array],
+            sorted((r.key, r.tag) for r in test_array))
+
+    @unittest.skipIf(numpy_backend.numpy is None, "NumPy is not installed")
+    def test_numeric_arrays(self):
+        numpy = numpy_backend.numpy
+        test_array = numpy.array([random.random() for i in range(1000)])
+        expected = numpy.sort(test_array)
+        sort(test_array)
+        self.assertTrue(numpy.array_equal(test_array, expected))
+        test_array = typed_array.array('i', [random.randint(-100, 100) for i in range(1000)])
+        expected = sorted(test_array, reverse=True)
+        sort(test_array, reverse=True)
+        self.assertEqual(test_array.tolist(), expected)
+
+    def test_typed_buffers(self):
+        # With NumPy disabled the buffers are sorted in place by the pure Python implementation.
+        numpy = numpy_backend.numpy
+        numpy_backend.numpy = None
+        try:
+            values = [random.randint(-100, 100) for i in range(1000)]
+            test_array = typed_array.array('i', values)
+            sort(test_array, reverse=True)
+            self.assertEqual(test_array.tolist(), sorted(values, reverse=True))
+            test_array = buffers.memoryview_of('d', values)
+            sort(test_array, mode="natural")
+            self.assertEqual(test_array.tolist(), sorted(values))
+            for test_array in [typed_array.array('i', values), buffers.memoryview_of('q', values)]:
+                lean_mergesort(test_array, buffer_size=4)
+                self.assertEqual(test_array.tolist(), sorted(values))
+        finally:
+            numpy_backend.numpy = numpy
+
+
+# Test helper: compares on `key` only so that stability is observable.
+class Record:
+
+    def __init__(self, key, tag):
+        self.key = key
+        self.tag = tag
+
+    def __lt__(self, other):
+        return self.key < other.key
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+##
+# This module sorts batches of small arrays using sorting networks. A sorting network is a fixed
+# sequence of compare-exchange operations on pairs of positions which sorts any input of its size,
+# so it needs no loop control or data-dependent branching beyond each exchange.
+#
+# `NETWORKS` holds a network for each size from 2 to 16, written as layers of comparators which
+# touch disjoint positions. The networks for 2 to 12 and 14 to 16 inputs use the fewest comparators
+# known; the 13-input network is the 16-input network with its last three positions removed and uses
+# one more than the best known. Each network is verified by the 0-1 principle: a network sorts
+# every input if and only if it sorts every sequence of zeros and ones.
+#
+# For each size the network is compiled into a straight-line function which loads the elements into
+# local variables, runs the comparators, and stores the elements back. A 2-D NumPy array is sorted
+# row by row with each comparator applied to a whole pair of columns at once.
+#
+# Batcher, K. E. (1968) Sorting networks and their applications. AFIPS Spring Joint Computer
+# Conference, 32, 307-314.
+##
+
+import unittest
+import random
+import itertools
+import array as typed_array
+
+import insertion_sort
+import numpy_backend
+
+
+NETWORKS = {
+    2: [[(0, 1)]],
+    3: [[(0, 2)], [(0, 1)], [(1, 2)]],
+    4: [[(0, 2), (1, 3)], [(0, 1), (2, 3)], [(1, 2)]],
+    5: [[(0, 3), (1, 4)], [(0, 2), (1, 3)], [(0, 1), (2, 4)], [(1, 2), (3, 4)], [(2, 3)]],
+    6: [[(0, 5), (1, 3), (2, 4)], [(1, 2), (3, 4)], [(0, 3), (2, 5)], [(0, 1), (2, 3), (4, 5)],
+        [(1, 2), (3, 4)]],
+    7: [[(0, 6), (2, 3), (4, 5)], [(0, 2), (1, 4), (3, 6)], [(0, 1), (2, 5), (3, 4)],
+        [(1, 2), (4, 6)], [(2, 3), (4, 5)], [(1, 2), (3, 4), (5, 6)]],
+    8: [[(0, 2), (1, 3), (4, 6), (5, 7)], [(0, 4), (1, 5), (2, 6), (3, 7)],
+        [(0, 1), (2, 3), (4, 5), (6, 7)], [(2, 4), (3, 5)], [(1, 4), (3, 6)],
+        [(1, 2), (3, 4), (5, 6)]],
+    9: [[(0, 3), (1, 7), (2, 5), (4, 8)], [(0, 7), (2, 4), (3, 8), (5, 6)],
+        [(0, 2), (1, 3), (4, 5), (7, 8)], [(1, 4), (3, 6), (5, 7)],
+        [(0, 1), (2, 4), (3, 5), (6, 8)], [(2, 3), (4, 5), (6, 7)], [(1, 2), (3, 4), (5, 6)]],
+    10: [[(0, 8), (1, 9), (2, 7), (3, 5), (4, 6)], [(0, 2), (1, 4), (5, 8), (7, 9)],
+         [(0, 3), (2, 4), (5, 7), (6, 9)], [(0, 1), (3, 6), (8, 9)],
+         [(1, 5), (2, 3), (4, 8), (6, 7)], [(1, 2), (3, 5), (4, 6), (7, 8)],
+         [(2, 3), (4, 5), (6, 7)], [(3, 4), (5, 6)]],
+    11: [[(0, 9), (1, 6), (2, 4), (3, 7), (5, 8)], [(0, 1), (3, 5), (4, 10), (6, 9), (7, 8)],
+         [(1, 3), (2, 5), (4, 7), (8, 10)], [(0, 4), (1, 2), (3, 7), (5, 9), (6, 8)],
+         [(0, 1), (2, 6), (4, 5), (7, 8), (9, 10)], [(2, 4), (3, 6), (5, 7), (8, 9)],
+         [(1, 2), (3, 4), (5, 6), (7, 8)], [(2, 3), (4, 5), (6, 7)]],
+    12: [[(0, 8), (1, 7), (2, 6), (3, 11), (4, 10), (5, 9)],
+         [(0, 1), (2, 5), (3, 4), (6, 9), (7, 8), (10, 11)], [(0, 2), (1, 6), (5, 10), (9, 11)],
+         [(0, 3), (1, 2), (4, 6), (5, 7), (8, 11), (9, 10)], [(1, 4), (3, 5), (6, 8), (7, 10)],
+         [(1, 3), (2, 5), (6, 9), (8, 10)], [(2, 3), (4, 5), (6, 7), (8, 9)], [(4, 6), (5, 7)],
+         [(3, 4), (5, 6), (7, 8)]],
+    16: [[(0, 13), (1, 12), (2, 15), (3, 14), (4, 8), (5, 6), (7, 11), (9, 10)],
+         [(0, 5), (1, 7), (2, 9), (3, 4), (6, 13), (8, 14), (10, 15), (11, 12)],
+         [(0, 1), (2, 3), (4, 5), (6, 8), (7, 9), (10, 11), (12, 13), (14, 15)],
+         [(0, 2), (1, 3), (4, 10), (5, 11), (6, 7), (8, 9), (12, 14), (13, 15)],
+         [(1, 2), (3, 12), (4, 6), (5, 7), (8, 10), (9, 11), (13, 14)],
+         [(1, 4), (2, 6), (5, 8), (7, 10), (9, 13), (11, 14)], [(2, 4), (3, 6), (9, 12), (11, 13)],
+         [(3, 5), (6, 8), (7, 9), (10, 12)], [(3, 4), (5, 6), (7, 8), (9, 10), (11, 12)],
+         [(6, 7), (8, 9)]],
+}
+
+# The networks for 13 to 15 inputs are the 16-input network with its last positions removed, as if
+# those positions held values larger than any input.
+for n in (13, 14, 15):
+    NETWORKS[n] = [[(i, j) for i, j in layer if j < n] for layer in NETWORKS[16]]
+    NETWORKS[n] = [layer for layer in NETWORKS[n] if layer]
+
+# Arrays longer than this are sorted using insertion sort.
+MAX_NETWORK = 16
+
+
+# Returns a function which sorts an array of length `n` in place using the network for `n`.
+def compile_network(n):
+    names = ", ".join(f"x{i}" for i in range(n))
+    stores = ", ".join(f"a[{i}]" for i in range(n))
+    lines = [f"def sort{n}(a):", f"    {names}, = a"]
+    for i, j in itertools.chain.from_iterable(NETWORKS[n]):
+        lines.append(f"    if x{j} < x{i}: x{i}, x{j} = x{j}, x{i}")
+    lines.append(f"    {stores} = {names}")
+    namespace = {}
+    exec("\n".join(lines), namespace)
+    return namespace[f"sort{n}"]
+
+
+# Sorting functions indexed by array length. Arrays of length 0 and 1 are already sorted.
+sorters = [lambda a: None, lambda a: None] + [compile_network(n) for n in range(2, MAX_NETWORK + 1)]
+
+
+# Sorts each array in `arrays` in place. If `arrays` is a 2-D NumPy array each row is sorted.
+# Networks are not stable: elements which compare equal may be reordered.
+def sort_many(arrays):
+    if numpy_backend.numpy is not None and isinstance(arrays, numpy_backend.numpy.ndarray) \
+        and arrays.ndim == 2 and sort_rows(arrays):
+        return
+    for array in arrays:
+        n = len(array)
+        if n <= MAX_NETWORK:
+            sorters[n](array)
+        else:
+            insertion_sort.sort(array)
+
+
+# Sorts the array `array` in place using a sorting network if it is short enough.
+def sort(array):
+    sort_many([array])
+
+
+# Sorts each row of the 2-D NumPy array `a` in place by applying each comparator of the network to
+# a pair of columns at once. Returns false, without touching `a`, if the rows are longer than
+# MAX_NETWORK or the array can't be sorted by NumPy comparisons.
+def sort_rows(a):
+    numpy = numpy_backend.numpy
+    n = a.shape[1]
+    if n > MAX_NETWORK or a.dtype.kind not in "iuf" or not a.flags.writeable:
+        return False
+    if a.dtype.kind == "f" and numpy.isnan(a).any():
+        return False
+    if n < 2:
+        return True
+
+    # Each position becomes a contiguous row of the transposed copy.
+    columns = numpy.ascontiguousarray(a.T)
+    for i, j in itertools.chain.from_iterable(NETWORKS[n]):
+        low = numpy.minimum(columns[i], columns[j])
+        numpy.maximum(columns[i], columns[j], out=columns[j])
+        columns[i] = low
+    a[:] = columns.T
+    return True
+
+
+# Returns true if the input is empty, of length 1, or sorted in ascending order.
+def is_sorted(array):
+    for index in range(1, len(array)):
+        if array[index] < array[index - 1]:
+            return False
+    return True
+
+
+class TestSort(unittest.TestCase):
+
+    def test_networks(self):
+        # Each network sorts all 2^n sequences of zeros and ones. Position i holds, as the bits of
+        # an int, the value at that position for every sequence at once: the minimum of two
+        # positions is their bitwise AND and the maximum is their bitwise OR.
+        for n, network in NETWORKS.items():
+            wires = [sum(1 << x for x in range(1 << n) if x >> i & 1) for i in range(n)]
+            for i, j in itertools.chain.from_iterable(network):
+                self.assertLess(i, j)
+                wires[i], wires[j] = wires[i] & wires[j], wires[i] | wires[j]
+            for i in range(n - 1):
+                self.assertEqual(wires[i] & ~wires[i + 1], 0)
+            for layer in network:
+                positions = [p for pair in layer for p in pair]
+                self.assertEqual(len(positions), len(set(positions)))
+
+    def test_sizes(self):
+        sizes = {n: sum(len(layer) for layer in NETWORKS[n]) for n in NETWORKS}
+        self.assertEqual([sizes[n] for n in range(2, 17)],
+            [1, 3, 5, 9, 12, 16, 19, 25, 29, 35, 39, 46, 51, 56, 60])
+
+    def test_sort_many(self):
+        arrays = [[random.randint(0, 10) for i in range(random.randint(0, 40))] for j in range(1000)]
+        expected = [sorted(array) for array in arrays]
+        sort_many(arrays)
+        self.assertEqual(arrays, expected)
+
+    def test_all_permutations(self):
+        for n in range(2, 8):
+            for permutation in itertools.permutations(range(n)):
+                test_array = list(permutation)
+                sort(test_array)
+                self.assertEqual(test_array, list(range(n)))
+
+    def test_typed_buffers(self):
+        values = [random.randint(-100, 100) for i in range(16)]
+        arrays = [typed_array.array('i', values[:n]) for n in range(17)]
+        sort_many(arrays)
+        for n, array in enumerate(arrays):
+            self.assertEqual(array.tolist(), sorted(values[:n]))
+
+    @unittest.skipIf(numpy_backend.numpy is None, "NumPy is not installed")
+    def test_numpy_rows(self):
+        numpy = numpy_backend.numpy
+        for n in range(0, 20):
+            a = numpy.array([[random.randint(0, 50) for i in range(n)] for j in range(100)])
+            expected = numpy.sort(a, axis=1)
+            sort_many(a)
+            self.assertTrue(numpy.array_equal(a, expected))
+        a = numpy.array([[random.random() for i in range(8)] for j in range(100)], dtype=numpy.float32)
+        expected = numpy.sort(a, axis=1)
+        self.assertTrue(sort_rows(a))
+        self.assertTrue(numpy.array_equal(a, expected))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,442 @@
+#!/usr/bin/env python3
+##
+# This module contains vectorized versions of mergesort, quicksort and heapsort for numeric arrays.
+# They are used by `mergesort.sort`, `quicksort.sort`, `quicksort_3way.sort` and `heapsort.sort`
+# when NumPy is installed and the input is a NumPy array, a numeric `array.array`, or a memoryview
+# with a numeric format.
+#
+# The array is sorted in place through a NumPy view of its buffer, so the data is never copied into
+# a list. Each algorithm keeps its structure but runs a whole stage at once on the buffer: a merge
+# pass merges every pair of runs, a partition step compares a whole block of a long slice or
+# partitions a whole batch of short slices, and heap construction sinks every node on a level of
+# the heap. Quicksort needs only O(CHUNK) scratch space; mergesort and heap construction need O(n).
+#
+# NumPy is optional. Without it `as_ndarray()` always returns None and the sort modules use their
+# pure Python implementations.
+##
+
+import unittest
+import random
+import tracemalloc
+import array as typed_array
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+# Merge passes with runs up to this length compare every pair of elements in each pair of runs
+# at once. Longer runs are merged using a binary search. Quicksort finishes slices up to this
+# length in the same way.
+BLOCK_WIDTH = 16
+
+# Quicksort partitions slices longer than this one at a time, and shorter slices in batches of about
+# this many elements.
+CHUNK = 1 << 14
+
+# Number of elements compared at once at each end of a slice by partition_blocks().
+PARTITION_BLOCK = 1024
+
+
+# Returns a NumPy view of `array` sharing its memory, or None if NumPy is not installed or `array`
+# is not a writable, contiguous, one-dimensional array of ints or floats. Float arrays containing
+# NaN are also rejected as NaN has no place in the ordering.
+def as_ndarray(array):
+    if numpy is None:
+        return None
+    if isinstance(array, numpy.ndarray):
+        view = array
+    elif isinstance(array, typed_array.array) and array.typecode not in "uw":
+        if len(array) == 0:
+            return None
+        view = numpy.frombuffer(array, dtype=array.typecode)
+    elif isinstance(array, memoryview) and not array.readonly:
+        if len(array) == 0:
+            return None
+        view = numpy.asarray(array)
+    else:
+        return None
+    if view.ndim != 1 or view.dtype.kind not in "iuf" or not view.dtype.isnative:
+        return None
+    if not view.flags.writeable or not view.flags.c_contiguous:
+        return None
+    if view.dtype.kind == "f" and numpy.isnan(view).any():
+        return None
+    return view
+
+
+# Reverses the NumPy array `a` in place.
+def reverse(a):
+    a[:] = a[::-1]
+
+
+# Stable bottom-up mergesort. Each pass merges every pair of adjacent runs of length `width` from
+# one buffer into the other, then the buffers swap roles.
+def mergesort(a):
+    n = len(a)
+    aux = numpy.empty_like(a)
+    src, dst = a, aux
+    width = 1
+    while width < n:
+        if width <= BLOCK_WIDTH:
+            merge_pass_blocked(src, dst, width)
+        else:
+            for low in range(0, n, 2 * width):
+                merge(src, dst, low, min(low + width, n), min(low + 2 * width, n))
+        src, dst = dst, src
+        width *= 2
+    if src is not a:
+        a[:] = src
+
+
+# Merges every pair of adjacent runs of length `width` in `src` into `dst`. The final position of
+# an element is its index in its own run plus the number of elements in the other run which precede
+# it: those strictly less than it if it is in the left run, those less than or equal to it if it is
+# in the right run. This keeps the merge stable.
+def merge_pass_blocked(src, dst, width):
+    n = len(src)
+    size = 2 * width
+    m = n - n % size
+    if m:
+        blocks = src[:m].reshape(-1, 2, width)
+        left, right = blocks[:, 0, :], blocks[:, 1, :]
+        pos_left = numpy.arange(width) + (right[:, None, :] < left[:, :, None]).sum(axis=2)
+        pos_right = numpy.arange(width) + (left[:, None, :] <= right[:, :, None]).sum(axis=2)
+        out = dst[:m].reshape(-1, size)
+        numpy.put_along_axis(out, pos_left, left, axis=1)
+        numpy.put_along_axis(out, pos_right, right, axis=1)
+    if m < n:
+        merge(src, dst, m, min(m + width, n), n)
+
+
+# Merges the sorted slices src[low..mid) and src[mid..high) into dst[low..high).
+def merge(src, dst, low, mid, high):
+    left, right = src[low:mid], src[mid:high]
+    if len(right) == 0 or not right[0] < left[-1]:
+        dst[low:high] = src[low:high]
+        return
+    dst[low + numpy.arange(len(left)) + numpy.searchsorted(right, left, side="left")] = left
+    dst[low + numpy.arange(len(right)) + numpy.searchsorted(left, right, side="right")] = right
+
+
+# Quicksort with 3-way partitioning which works in place with O(CHUNK) scratch space. Slices longer
+# than CHUNK are partitioned one at a time by partition_blocks(). Shorter slices are collected and
+# handed to quicksort_slices() in batches of about CHUNK elements. Slices still longer than CHUNK
+# after 2*log(n) partitioning steps are heapsorted.
+def quicksort(a):
+    n = len(a)
+    stack = [(0, n, 2 * n.bit_length())]
+    starts, ends = [], []
+    total = 0
+    while stack:
+        low, high, depth = stack.pop()
+        if high - low <= CHUNK:
+            if high - low > 1:
+                starts.append(low)
+                ends.append(high)
+                total += high - low
+                if total >= CHUNK:
+                    quicksort_slices(a, starts, ends)
+                    starts, ends = [], []
+                    total = 0
+            continue
+
+        lt, gt = partition_blocks(a, low, high)
+        if depth == 0 or (lt == low and gt == low) or (lt == high and gt == high):
+            heapsort(a[low:high])
+            continue
+        stack.append((low, lt, depth - 1))
+        stack.append((gt, high, depth - 1))
+
+    if starts:
+        quicksort_slices(a, starts, ends)
+
+
+# Partitions a[low..high) in place around the median of its first, middle and last elements and
+# returns `lt` and `gt` such that a[low..lt) <= pivot, a[lt..gt) == pivot and a[gt..high) >= pivot.
+#
+# A block of PARTITION_BLOCK elements is taken from each end. The elements of the left block which
+# are not less than the pivot are swapped with as many elements of the right block which are not
+# greater than it, and whichever block has no misplaced elements left is finished. Elements equal to
+# the pivot are swapped in both directions, so runs of duplicates are split evenly. The remaining
+# middle, shorter than two blocks, is partitioned three ways.
+def partition_blocks(a, low, high):
+    x, y, z = a[low], a[low + (high - low) // 2], a[high - 1]
+    pivot = max(min(x, y), min(max(x, y), z))
+
+    size = PARTITION_BLOCK
+    l, r = low, high
+    while r - l >= 2 * size:
+        bad_left = numpy.flatnonzero(a[l:l + size] >= pivot)
+        bad_right = numpy.flatnonzero(a[r - size:r] <= pivot)
+        k = min(bad_left.size, bad_right.size)
+        if k:
+            i, j = l + bad_left[:k], r - size + bad_right[:k]
+            item = a[i]
+            a[i] = a[j]
+            a[j] = item
+        if k == bad_left.size:
+            l += size
+        if k == bad_right.size:
+            r -= size
+
+    middle = a[l:r]
+    less, equal, greater = middle[middle < pivot], middle[middle == pivot], middle[middle > pivot]
+    lt, gt = l + less.size, l + less.size + equal.size
+    a[l:lt] = less
+    a[lt:gt] = equal
+    a[gt:r] = greater
+    return lt, gt
+
+
+# Sorts each of the slices a[starts[i]..ends[i]) with a batched 3-way quicksort. Rather than
+# partitioning one slice at a time, each step partitions every pending slice at once around the
+# median of its first, middle and last elements. Elements equal to the pivot are finished; the
+# less-than and greater-than parts become the pending slices for the next step. Short slices are
+# finished together by sort_slices(). Any slices still pending after 2*log(n) steps are mergesorted.
+# The scratch space is a few arrays as long as the slices put together.
+def quicksort_slices(a, starts, ends):
+    starts = numpy.array(starts, dtype=numpy.intp)
+    ends = numpy.array(ends, dtype=numpy.intp)
+
+    depth_limit = 2 * int((ends - starts).max()).bit_length()
+    while starts.size:
+        short = ends - starts <= BLOCK_WIDTH
+        if short.any():
+            sort_slices(a, starts[short], ends[short])
+            starts, ends = starts[~short], ends[~short]
+            if not starts.size:
+                return
+
+        if depth_limit == 0:
+            for low, high in zip(starts.tolist(), ends.tolist()):
+                mergesort(a[low:high])
+            return
+        depth_limit -= 1
+
+        # Gather the elements of all the pending slices, tagging each with the index of its slice.
+        k = starts.size
+        lengths = ends - starts
+        seg = numpy.repeat(numpy.arange(k), lengths)
+        offsets = numpy.cumsum(lengths) - lengths
+        indices = numpy.arange(seg.size) - offsets[seg] + starts[seg]
+        values = a[indices]
+
+        x, y, z = a[starts], a[starts + lengths // 2], a[ends - 1]
+        pivots = numpy.maximum(numpy.minimum(x, y), numpy.minimum(numpy.maximum(x, y), z))
+
+        # Class 0, 1, 2 for elements less than, equal to, and greater than their slice's pivot.
+        pivot = pivots[seg]
+        cls = (values > pivot).astype(numpy.intp) * 2 + (values == pivot)
+        counts = numpy.bincount(seg * 3 + cls, minlength=3 * k).reshape(k, 3)
+
+        # Each class is written to its own block within the slice, preserving relative order.
+        dest = numpy.empty_like(indices)
+        base = starts.copy()
+        for c in range(3):
+            mask = cls == c
+            before = numpy.cumsum(counts[:, c]) - counts[:, c]
+            dest[mask] = base[seg[mask]] + numpy.arange(numpy.count_nonzero(mask)) - before[seg[mask]]
+            base += counts[:, c]
+        a[dest] = values
+
+        lt_end = starts + counts[:, 0]
+        gt_start = lt_end + counts[:, 1]
+        keep_lt = counts[:, 0] > 1
+        keep_gt = counts[:, 2] > 1
+        starts = numpy.concatenate([starts[keep_lt], gt_start[keep_gt]])
+        ends = numpy.concatenate([lt_end[keep_lt], ends[keep_gt]])
+
+
+# Sorts each of the slices a[starts[i]..ends[i]), all of length at most BLOCK_WIDTH. Each slice is
+# loaded into a row of a matrix padded with the largest value of the dtype, then every element is
+# moved to its rank in its row: the number of elements less than it plus the number of equal
+# elements before it.
+def sort_slices(a, starts, ends):
+    if a.dtype.kind == "f":
+        fill = numpy.inf
+    else:
+        fill = numpy.iinfo(a.dtype).max
+    lengths = ends - starts
+    columns = numpy.arange(BLOCK_WIDTH)
+    valid = columns < lengths[:, None]
+    indices = numpy.where(valid, starts[:, None] + columns, 0)
+    rows = numpy.where(valid, a[indices], fill)
+
+    less = rows[:, None, :] < rows[:, :, None]
+    equal_before = (rows[:, None, :] == rows[:, :, None]) & (columns < columns[:, None])
+    ranks = (less | equal_before).sum(axis=2)
+
+    out = numpy.empty_like(rows)
+    numpy.put_along_axis(out, ranks, rows, axis=1)
+    a[indices[valid]] = out[valid]
+
+
+# Heapsort using a 0-based max-heap with `arity` children per node. The subtrees rooted at the nodes
+# on one level of the heap are disjoint, so heap construction sinks all the nodes on a level at once,
+# working up from the deepest level with children. The sortdown is inherently sequential and runs
+# over a memoryview of the buffer, or over the array itself for dtypes such as float16 and
+# longdouble which a memoryview can't index.
+def heapsort(a, arity=2):
+    n = len(a)
+    if n < 2:
+        return
+    d = arity
+
+    # Level k of the heap holds the nodes from (d^k - 1)/(d - 1) up to (d^(k+1) - 1)/(d - 1).
+    last = (n - 2) // d
+    bounds = [0]
+    while bounds[-1] <= last:
+        bounds.append(bounds[-1] * d + 1)
+    for low, high in zip(reversed(bounds[:-1]), reversed(bounds[1:])):
+        sink_all(a, numpy.arange(low, min(high, last + 1)), n, d)
+
+    buf = item_view(a)
+    for end in range(n - 1, 0, -1):
+        item = buf[end]
+        buf[end] = buf[0]
+        i = 0
+        while True:
+            j = d * i + 1
+            if j >= end:
+                break
+            if d == 2:
+                if j + 1 < end and buf[j] < buf[j + 1]:
+                    j += 1
+            else:
+                for c in range(j + 1, min(j + d, end)):
+                    if buf[j] < buf[c]:
+                        j = c
+            if not item < buf[j]:
+                break
+            buf[i] = buf[j]
+            i = j
+        buf[i] = item
+
+
+# Returns a memoryview of the NumPy array `a` if a memoryview can index its dtype, otherwise `a`.
+def item_view(a):
+    buf = memoryview(a)
+    try:
+        buf[0]
+    except NotImplementedError:
+        return a
+    return buf
+
+
+# Sinks each of the heap nodes in `nodes` simultaneously in a heap with `d` children per node. The
+# nodes must have disjoint subtrees.
+def sink_all(a, nodes, n, d):
+    i = nodes
+    offsets = numpy.arange(d)
+    while i.size:
+        first = d * i + 1
+        has_child = first < n
+        i, first = i[has_child], first[has_child]
+
+        # The largest child; missing children count as copies of the first.
+        children = first[:, None] + offsets
+        values = a[numpy.minimum(children, n - 1)]
+        values = numpy.where(children < n, values, values[:, :1])
+        child = first + values.argmax(axis=1)
+
+        larger = a[i] < a[child]
+        i, child = i[larger], child[larger]
+        item = a[i]
+        a[i] = a[child]
+        a[child] = item
+        i = child
+
+
+@unittest.skipIf(numpy is None, "NumPy is not installed")
+class TestNumpyBackend(unittest.TestCase):
+
+    def arrays(self):
+        yield numpy.array([random.randint(0, 10**6) for i in range(1000)])
+        yield numpy.array([random.randint(0, 5) for i in range(1000)], dtype=numpy.int8)
+        yield numpy.array([random.random() for i in range(777)])
+        yield numpy.arange(1000, 0, -1, dtype=numpy.uint32)
+        yield numpy.ones(100)
+        yield numpy.array([3.0])
+        yield numpy.array([random.random() for i in range(500)], dtype=numpy.float16)
+        yield numpy.array([random.random() for i in range(500)], dtype=numpy.longdouble)
+
+    def test_mergesort(self):
+        for a in self.arrays():
+            expected = numpy.sort(a)
+            mergesort(a)
+            self.assertTrue(numpy.array_equal(a, expected))
+
+    def test_quicksort(self):
+        for a in self.arrays():
+            expected = numpy.sort(a)
+            quicksort(a)
+            self.assertTrue(numpy.array_equal(a, expected))
+
+    def test_heapsort(self):
+        for a in self.arrays():
+            expected = numpy.sort(a)
+            heapsort(a)
+            self.assertTrue(numpy.array_equal(a, expected))
+
+    def test_heapsort_arity(self):
+        for arity in [3, 4, 7]:
+            for a in self.arrays():
+                expected = numpy.sort(a)
+                heapsort(a, arity)
+                self.assertTrue(numpy.array_equal(a, expected))
+
+    def test_quicksort_in_place(self):
+        # Small blocks and chunks send these arrays through the in-place block partition.
+        global CHUNK, PARTITION_BLOCK
+        chunk, block = CHUNK, PARTITION_BLOCK
+        CHUNK, PARTITION_BLOCK = 64, 8
+        try:
+            for a in self.arrays():
+                expected = numpy.sort(a)
+                quicksort(a)
+                self.assertTrue(numpy.array_equal(a, expected))
+        finally:
+            CHUNK, PARTITION_BLOCK = chunk, block
+
+    def test_quicksort_scratch_space(self):
+        # The scratch space depends on CHUNK, not on the length of the array.
+        global CHUNK
+        chunk = CHUNK
+        CHUNK = 1024
+        a = numpy.random.default_rng().integers(0, 2**31, 1 << 18, dtype=numpy.int64)
+        expected = numpy.sort(a)
+        tracemalloc.start()
+        try:
+            quicksort(a)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+            CHUNK = chunk
+        self.assertTrue(numpy.array_equal(a, expected))
+        self.assertLess(peak, a.nbytes // 4)
+
+    def test_mergesort_is_stable(self):
+        # -0.0 and 0.0 compare equal but can be told apart.
+        a = numpy.array([random.choice([0.0, -0.0, 1.0]) for i in range(1000)])
+        expected = numpy.sort(a, kind="stable")
+        mergesort(a)
+        self.assertTrue(numpy.array_equal(numpy.signbit(a), numpy.signbit(expected)))
+
+    def test_as_ndarray_shares_memory(self):
+        typed = typed_array.array("d", [2.0, 1.0])
+        view = as_ndarray(typed)
+        view[0] = 5.0
+        self.assertEqual(typed[0], 5.0)
+        self.assertIsNone(as_ndarray([1, 2]))
+        self.assertIsNone(as_ndarray(typed_array.array("d", [1.0, float("nan")])))
+        self.assertIsNone(as_ndarray(numpy.arange(10)[::2]))
+        buffer = memoryview(bytearray(typed.tobytes())).cast("d")
+        as_ndarray(buffer)[1] = 7.0
+        self.assertEqual(buffer[1], 7.0)
+        self.assertIsNone(as_ndarray(memoryview(b"ab")))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+##
+# This module contains a parallel mergesort. The input is split into one chunk per worker, each
+# chunk is sorted in a separate process using the top-down mergesort from `mergesort.py`, and the
+# sorted chunks are combined with a heap-based k-way merge.
+#
+# Arrays of plain ints or floats, `array.array` instances and memoryviews are handed to the workers
+# through a shared memory block so the data is never pickled. Each worker sorts its slice of the
+# block in place. Other arrays are pickled out to the workers and back again.
+##
+
+import unittest
+import random
+import os
+import struct
+import array as typed_array
+from multiprocessing import Pool, shared_memory
+
+import mergesort
+
+
+# Inputs shorter than this are sorted serially as process startup would dominate the runtime.
+THRESHOLD = 50_000
+
+
+def sort(array):
+    parallel_sort(array)
+
+
+def parallel_sort(array, workers=None, threshold=THRESHOLD):
+    n = len(array)
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers < 2 or n < max(threshold, 2 * workers):
+        mergesort.sort(array)
+        return
+
+    bounds = [(w * n // workers, (w + 1) * n // workers) for w in range(workers)]
+    typecode = numeric_typecode(array)
+    if typecode is None:
+        with Pool(workers) as pool:
+            runs = pool.map(sort_chunk, [list(array[low:high]) for low, high in bounds])
+        kway_merge(array, runs)
+        return
+
+    itemsize = struct.calcsize(typecode)
+    shm = shared_memory.SharedMemory(create=True, size=n * itemsize)
+    try:
+        view = shm.buf[:n * itemsize].cast(typecode)
+        if isinstance(array, list):
+            view[:] = typed_array.array(typecode, array)
+        else:
+            view[:] = array
+        with Pool(workers) as pool:
+            pool.starmap(sort_shared_chunk, [(shm.name, typecode, n, low, high) for low, high in bounds])
+        runs = [view[low:high] for low, high in bounds]
+        kway_merge(array, runs)
+        for run in runs:
+            run.release()
+        view.release()
+    finally:
+        shm.close()
+        shm.unlink()
+
+
+# Returns the struct format to use for sharing the input with the workers, or None if the input
+# can't be shared. Typed arrays and memoryviews keep their own format. A list must be made up
+# entirely of plain ints fitting in 64 bits or entirely of floats.
+def numeric_typecode(array):
+    if isinstance(array, typed_array.array):
+        return array.typecode if array.typecode not in "uw" else None
+    if isinstance(array, memoryview):
+        return array.format if len(array.format) == 1 and array.contiguous else None
+    if all(type(item) is int for item in array):
+        if -2**63 <= min(array) and max(array) < 2**63:
+            return 'q'
+        return None
+    if all(type(item) is float for item in array):
+        return 'd'
+    return None
+
+
+# Worker: sorts a chunk which has been pickled across from the parent process.
+def sort_chunk(chunk):
+    mergesort.sort(chunk)
+    return chunk
+
+
+# Worker: sorts the slice [low..high) of the shared memory block `name` in place.
+def sort_shared_chunk(name, typecode, n, low, high):
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        view = shm.buf[:n * struct.calcsize(typecode)].cast(typecode)
+        chunk = view[low:high]
+        mergesort.sort(chunk)
+        chunk.release()
+        view.release()
+    finally:
+        shm.close()
+
+
+# Merges the sorted `runs` into `array` using a binary min-heap of run indices. Ties go to the
+# lower-numbered run which keeps the merge stable as the runs are consecutive slices of the input.
+def kway_merge(array, runs):
+    heads = [0 for _ in runs]
+    heap = [r for r in range(len(runs)) if runs[r]]
+    for i in range(len(heap) // 2 - 1, -1, -1):
+        sink(heap, i, runs, heads)
+
+    k = 0
+    while heap:
+        r = heap[0]
+        array[k] = runs[r][heads[r]]
+        k += 1
+        heads[r] += 1
+        if heads[r] == len(runs[r]):
+            last = heap.pop()
+            if not heap:
+                break
+            heap[0] = last
+        sink(heap, 0, runs, heads)
+
+
+def sink(heap, i, runs, heads):
+    n = len(heap)
+    while 2 * i + 1 < n:
+        j = 2 * i + 1
+        if j + 1 < n and precedes(heap[j + 1], heap[j], runs, heads):
+            j = j + 1
+        if not precedes(heap[j], heap[i], runs, heads):
+            break
+        heap[i], heap[j] = heap[j], heap[i]
+        i = j
+
+
+# Returns true if the head of run `r` should be output before the head of run `s`.
+def precedes(r, s, runs, heads):
+    a = runs[r][heads[r]]
+    b = runs[s][heads[s]]
+    if a < b:
+        return True
+    if b < a:
+        return False
+    return r < s
+
+
+# Returns true if the input is empty, of length 1, or sorted in ascending order.
+def is_sorted(array):
+    for index in range(1, len(array)):
+        if array[index] < array[index - 1]:
+            return False
+    return True
+
+
+class TestSort(unittest.TestCase):
+
+    def test_sort(self):
+        test_array = [i for i in range(1000)]
+        while is_sorted(test_array):
+            random.shuffle(test_array)
+        sort(test_array)
+        self.assertTrue(is_sorted(test_array))
+
+    def test_parallel_ints(self):
+        test_array = [random.randint(-1000, 1000) for i in range(5000)]
+        expected = sorted(test_array)
+        parallel_sort(test_array, workers=4, threshold=0)
+        self.assertEqual(test_array, expected)
+
+    def test_parallel_floats(self):
+        test_array = [random.random() for i in range(5000)]
+        expected = sorted(test_array)
+        parallel_sort(test_array, workers=3, threshold=0)
+        self.assertEqual(test_array, expected)
+
+    def test_parallel_strings(self):
+        test_array = [str(random.randint(0, 10000)) for i in range(5000)]
+        expected = sorted(test_array)
+        parallel_sort(test_array, workers=4, threshold=0)
+        self.assertEqual(test_array, expected)
+
+    def test_parallel_typed_buffers(self):
+        values = [random.randint(-1000, 1000) for i in range(5000)]
+        test_array = typed_array.array('i', values)
+        parallel_sort(test_array, workers=4, threshold=0)
+        self.assertEqual(test_array.tolist(), sorted(values))
+        test_array = memoryview(bytearray(typed_array.array('h', values).tobytes())).cast('h')
+        parallel_sort(test_array, workers=3, threshold=0)
+        self.assertEqual(test_array.tolist(), sorted(values))
+
+    def test_kway_merge_is_stable(self):
+        runs = [[(1, 'a'), (2, 'a')], [(1, 'b'), (3, 'b')], [(1, 'c'), (2, 'c')]]
+        result = [None for _ in range(6)]
+        kway_merge(result, [[Record(*item) for item in run] for run in runs])
+        self.assertEqual([(r.key, r.tag) for r in result],
+            [(1, 'a'), (1, 'b'), (1, 'c'), (2, 'a'), (2, 'c'), (3, 'b')])
+
+
+# Test helper: compares on `key` only so that stability is observable.
+class Record:
+
+    def __init__(self, key, tag):
+        self.key = key
+        self.tag = tag
+
+    def __lt__(self, other):
+        return self.key < other.key
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,49 +1,113 @@
 #!/usr/bin/env python3
 ##
 # This module contains a reference implementation of a priority queue based on a binary heap.
+#
+# The indexed queues `IndexMinPQ` and `IndexMaxPQ` associate each priority with a hashable handle,
+# such as a vertex number. A map from each handle to its position in the heap lets the priority of
+# a queued handle be changed, or the handle deleted, in O(log n) time. This suits algorithms like
+# Dijkstra's and Prim's which would otherwise insert a fresh entry for each improved priority and
+# leave the stale entries in the heap.
 ##
 
 import unittest
 import random
 
 
-# Base class for both max and min priority queues.
+# Base class for both max and min priority queues. The heap array starts with room for `capacity`
+# items, doubles in size when it fills up, and halves when it falls to a quarter full.
 class PriorityQueue:
 
-    def __init__(self, capacity):
+    def __init__(self, capacity=1):
         self.size = 0
-        self.heap = [None for i in range(capacity + 1)]
+        self.heap = [None for i in range(max(capacity, 1) + 1)]
+
+    # Returns a new queue holding the items of `iterable`. The heap is built bottom-up, sinking each
+    # parent in turn, which takes O(n) time rather than the O(n log n) of n separate inserts.
+    @classmethod
+    def from_iterable(cls, iterable):
+        items = list(iterable)
+        pq = cls(len(items))
+        pq.heap[1:len(items) + 1] = items
+        pq.size = len(items)
+        pq._heapify()
+        return pq
 
     def is_empty(self):
         return self.size == 0
 
     # Inserts an item.
     def insert(self, item):
+        if self.size == len(self.heap) - 1:
+            self._resize(2 * self.size)
         self.size += 1
         self.heap[self.size] = item
         self._swim(self.size)
 
-    # Removes and returns the top (max or min) item from the queue.
+    # Removes and returns the top (max or min) item from the queue. Raises an IndexError if the
+    # queue is empty.
     def remove(self):
+        if self.size == 0:
+            raise IndexError("remove from empty priority queue")
         item = self.heap[1]
         self._swap(1, self.size)
         self.heap[self.size] = None
         self.size -= 1
         self._sink(1)
+        self._shrink()
         return item
 
-    # Returns the top (max or min) item without removing it.
+    # Returns the top (max or min) item without removing it. Raises an IndexError if the queue is
+    # empty.
     def peek(self):
+        if self.size == 0:
+            raise IndexError("peek at empty priority queue")
         return self.heap[1]
 
+    # Inserts `item` and then removes and returns the top item, using a single sink. If `item`
+    # would be the top item it is returned at once.
+    def pushpop(self, item):
+        if self.size > 0 and self._outranks(self.heap[1], item):
+            item, self.heap[1] = self.heap[1], item
+            self._sink(1)
+        return item
+
+    # Removes and returns the top item and then inserts `item`, using a single sink. Raises an
+    # IndexError if the queue is empty.
+    def replace(self, item):
+        if self.size == 0:
+            raise IndexError("replace in empty priority queue")
+        top = self.heap[1]
+        self.heap[1] = item
+        self._sink(1)
+        return top
+
     # Swaps heap elements at indices `p` and `q`.
     def _swap(self, p, q):
         self.heap[p], self.heap[q] = self.heap[q], self.heap[p]
 
+    # Restores the heap order of heap[1..size] by sinking each parent, from the last up.
+    def _heapify(self):
+        for i in range(self.size // 2, 0, -1):
+            self._sink(i)
+
+    # Moves the items to a heap array with room for `capacity` items.
+    def _resize(self, capacity):
+        self.heap = self.heap[:self.size + 1] + [None for i in range(capacity - self.size)]
+
+    # Halves the heap array if it is at most a quarter full.
+    def _shrink(self):
+        capacity = len(self.heap) - 1
+        if 0 < self.size <= capacity // 4:
+            self._resize(capacity // 2)
+
 
 # Always returns the maximum item from the queue.
 class MaxPriorityQueue(PriorityQueue):
 
+    # Returns true if `a` comes out of the queue strictly before `b`.
+    def _outranks(self, a, b):
+        return a > b
+
     def _swim(self, i):
         while i > 1 and self.heap[i//2] < self.heap[i]:
             self._swap(i//2, i)
@@ -63,6 +127,10 @@ class MaxPriorityQueue(PriorityQueue):
 # Always returns the minimum item from the queue.
 class MinPriorityQueue(PriorityQueue):
 
+    # Returns true if `a` comes out of the queue strictly before `b`.
+    def _outranks(self, a, b):
+        return a < b
+
     def _swim(self, i):
         while i > 1 and self.heap[i//2] > self.heap[i]:
             self._swap(i//2, i)
@@ -79,6 +147,130 @@ class MinPriorityQueue(PriorityQueue):
             i = j
 
 
+# Heap entry of an indexed priority queue. Entries compare by priority only.
+class _Entry:
+
+    def __init__(self, priority, handle):
+        self.priority = priority
+        self.handle = handle
+
+    def __lt__(self, other):
+        return self.priority < other.priority
+
+    def __gt__(self, other):
+        return self.priority > other.priority
+
+    def __ge__(self, other):
+        return self.priority >= other.priority
+
+
+# Base class for both indexed priority queues. It stores _Entry objects in the heap and overrides
+# `_swap` to keep the position map up to date; the `_swim` and `_sink` methods of the min or max
+# queue it is combined with are used unchanged.
+class IndexedPriorityQueue(PriorityQueue):
+
+    def __init__(self, capacity=1):
+        super().__init__(capacity)
+        self.positions = {}
+
+    # Returns a new queue holding the (handle, priority) pairs of `iterable`, built in O(n) time.
+    # Raises a KeyError if a handle appears twice.
+    @classmethod
+    def from_iterable(cls, iterable):
+        pq = super().from_iterable(_Entry(priority, handle) for handle, priority in iterable)
+        pq.positions = {pq.heap[i].handle: i for i in range(1, pq.size + 1)}
+        if len(pq.positions) < pq.size:
+            raise KeyError("duplicate handle")
+        return pq
+
+    # Inserts `handle` with the given priority. Raises a KeyError if `handle` is already queued.
+    def insert(self, handle, priority):
+        if handle in self.positions:
+            raise KeyError(f"handle already in queue: {handle!r}")
+        self.positions[handle] = self.size + 1
+        super().insert(_Entry(priority, handle))
+
+    # Removes and returns the handle with the top (max or min) priority.
+    def remove(self):
+        entry = super().remove()
+        del self.positions[entry.handle]
+        return entry.handle
+
+    # Returns the handle with the top (max or min) priority without removing it.
+    def peek(self):
+        return super().peek().handle
+
+    # Inserts `handle` and then removes and returns the handle with the top priority, using a single
+    # sink. Raises a KeyError if `handle` is already queued.
+    def pushpop(self, handle, priority):
+        if handle in self.positions:
+            raise KeyError(f"handle already in queue: {handle!r}")
+        self.positions[handle] = 1
+        entry = super().pushpop(_Entry(priority, handle))
+        del self.positions[entry.handle]
+        return entry.handle
+
+    # Removes and returns the handle with the top priority and then inserts `handle`, using a single
+    # sink. Raises a KeyError if `handle` is already queued or an IndexError if the queue is empty.
+    def replace(self, handle, priority):
+        if handle in self.positions:
+            raise KeyError(f"handle already in queue: {handle!r}")
+        if self.size == 0:
+            raise IndexError("replace in empty priority queue")
+        del self.positions[self.heap[1].handle]
+        self.positions[handle] = 1
+        return super().replace(_Entry(priority, handle)).handle
+
+    # Returns true if `handle` is in the queue.
+    def contains(self, handle):
+        return handle in self.positions
+
+    def __contains__(self, handle):
+        return handle in self.positions
+
+    # Returns the priority of `handle`. Raises a KeyError if `handle` isn't queued.
+    def priority(self, handle):
+        return self.heap[self.positions[handle]].priority
+
+    # Sets the priority of `handle`, which may be raised or lowered. Raises a KeyError if `handle`
+    # isn't queued.
+    def change_priority(self, handle, priority):
+        i = self.positions[handle]
+        self.heap[i].priority = priority
+        self._swim(i)
+        self._sink(self.positions[handle])
+
+    # Removes `handle` from the queue. Raises a KeyError if `handle` isn't queued.
+    def delete(self, handle):
+        i = self.positions[handle]
+        self._swap(i, self.size)
+        self.heap[self.size] = None
+        self.size -= 1
+        del self.positions[handle]
+        if i <= self.size:
+            # The entry moved into the hole may belong above or below it.
+            moved = self.heap[i].handle
+            self._swim(i)
+            self._sink(self.positions[moved])
+        self._shrink()
+
+    # Swaps heap elements at indices `p` and `q` and updates their positions.
+    def _swap(self, p, q):
+        super()._swap(p, q)
+        self.positions[self.heap[p].handle] = p
+        self.positions[self.heap[q].handle] = q
+
+
+# Indexed priority queue which always returns the handle with the minimum priority.
+class IndexMinPQ(IndexedPriorityQueue, MinPriorityQueue):
+    pass
+
+
+# Indexed priority queue which always returns the handle with the maximum priority.
+class IndexMaxPQ(IndexedPriorityQueue, MaxPriorityQueue):
+    pass
+
+
 class TestPriorityQueue(unittest.TestCase):
 
     def test_max_pq_small(self):
@@ -135,6 +327,123 @@ class TestPriorityQueue(unittest.TestCase):
         self.assertEqual(pq.remove(), 4)
         self.assertEqual(pq.size, 995)
 
+    def test_growth(self):
+        pq = MinPriorityQueue()
+        values = [random.randint(0, 100) for i in range(1000)]
+        for value in values:
+            pq.insert(value)
+        self.assertEqual(pq.size, 1000)
+        self.assertEqual([pq.remove() for i in range(990)], sorted(values)[:990])
+        self.assertLess(len(pq.heap), 100)
+
+    def test_from_iterable(self):
+        values = [random.randint(0, 100) for i in range(1000)]
+        pq = MaxPriorityQueue.from_iterable(values)
+        self.assertEqual(pq.size, 1000)
+        self.assertEqual([pq.remove() for i in range(1000)], sorted(values, reverse=True))
+        pq = MinPriorityQueue.from_iterable([])
+        self.assertTrue(pq.is_empty())
+        pq.insert(5)
+        self.assertEqual(pq.peek(), 5)
+
+    def test_pushpop_replace(self):
+        pq = MinPriorityQueue.from_iterable([3, 5, 7])
+        self.assertEqual(pq.pushpop(1), 1)
+        self.assertEqual(pq.pushpop(4), 3)
+        self.assertEqual(pq.replace(9), 4)
+        self.assertEqual([pq.remove() for i in range(3)], [5, 7, 9])
+        self.assertEqual(pq.pushpop(2), 2)
+        pq = MaxPriorityQueue.from_iterable([3, 5, 7])
+        self.assertEqual(pq.pushpop(1), 7)
+        self.assertEqual(pq.replace(0), 5)
+        self.assertEqual([pq.remove() for i in range(3)], [3, 1, 0])
+
+    def test_empty(self):
+        for pq in [MinPriorityQueue(), MaxPriorityQueue(10), IndexMinPQ()]:
+            with self.assertRaises(IndexError):
+                pq.remove()
+            with self.assertRaises(IndexError):
+                pq.peek()
+        with self.assertRaises(IndexError):
+            MinPriorityQueue().replace(1)
+        with self.assertRaises(IndexError):
+            IndexMaxPQ().replace("a", 1)
+
+
+class TestIndexPriorityQueue(unittest.TestCase):
+
+    def test_index_min_pq(self):
+        pq = IndexMinPQ(10)
+        for handle, priority in [("a", 5), ("b", 3), ("c", 8), ("d", 1)]:
+            pq.insert(handle, priority)
+        self.assertTrue(pq.contains("c"))
+        self.assertIn("c", pq)
+        self.assertNotIn("e", pq)
+        self.assertEqual(pq.peek(), "d")
+        pq.change_priority("c", 0)
+        self.assertEqual(pq.priority("c"), 0)
+        pq.change_priority("d", 9)
+        pq.delete("b")
+        self.assertNotIn("b", pq)
+        self.assertEqual([pq.remove() for i in range(pq.size)], ["c", "a", "d"])
+        self.assertTrue(pq.is_empty())
+        with self.assertRaises(KeyError):
+            pq.change_priority("a", 1)
+
+    def test_duplicate_handle(self):
+        pq = IndexMaxPQ(10)
+        pq.insert(1, 1.5)
+        with self.assertRaises(KeyError):
+            pq.insert(1, 2.5)
+        with self.assertRaises(KeyError):
+            pq.pushpop(1, 2.5)
+        with self.assertRaises(KeyError):
+            IndexMinPQ.from_iterable([("a", 1), ("b", 2), ("a", 3)])
+
+    def test_index_from_iterable(self):
+        pq = IndexMinPQ.from_iterable((handle, -handle) for handle in range(100))
+        self.assertEqual(pq.peek(), 99)
+        pq.change_priority(0, -1000)
+        self.assertEqual(pq.pushpop(100, -2000), 100)
+        self.assertEqual(pq.pushpop(101, 0), 0)
+        self.assertIn(101, pq)
+        self.assertEqual(pq.replace(102, -50), 99)
+        self.assertEqual([pq.remove() for i in range(3)], [98, 97, 96])
+
+    def test_random_operations(self):
+        # Compare against a dict of priorities, checking the heap order and position map as we go.
+        for cls in [IndexMinPQ, IndexMaxPQ]:
+            pq = cls()
+            priorities = {}
+            for step in range(1000):
+                handle = random.randint(0, 499)
+                op = random.random()
+                if handle not in priorities:
+                    priorities[handle] = random.randint(0, 100)
+                    pq.insert(handle, priorities[handle])
+                elif op < 0.4:
+                    priorities[handle] = random.randint(0, 100)
+                    pq.change_priority(handle, priorities[handle])
+                elif op < 0.6:
+                    del priorities[handle]
+                    pq.delete(handle)
+                elif op < 0.7:
+                    top = pq.remove()
+                    best = min(priorities.values()) if cls is IndexMinPQ else max(priorities.values())
+                    self.assertEqual(priorities.pop(top), best)
+                elif op < 0.8 and handle + 500 not in priorities:
+                    priority = random.randint(0, 100)
+                    priorities[handle + 500] = priority
+                    top = pq.pushpop(handle + 500, priority)
+                    best = min(priorities.values()) if cls is IndexMinPQ else max(priorities.values())
+                    self.assertEqual(priorities.pop(top), best)
+                self.assertEqual(pq.size, len(priorities))
+                for i in range(1, pq.size + 1):
+                    self.assertEqual(pq.positions[pq.heap[i].handle], i)
+                    if i > 1:
+                        parent, child = pq.heap[i // 2].priority, pq.heap[i].priority
+                        self.assertTrue(parent <= child if cls is IndexMinPQ else parent >= child)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+##
+# This module contains a reference implementation of quickselect, implemented as an introselect.
+# Selecting the kth smallest element partitions the array as quicksort would but only continues
+# into the side containing index k, so the expected cost is O(n) rather than O(n log n).
+#
+# Slices are partitioned in place by `quicksort.partition` using the pivots chosen by
+# `quicksort.choose_pivot`. When two successive pivots compare equal the input is likely to contain
+# many duplicates and the slice is partitioned 3-way by `quicksort_3way.partition3` instead, which
+# stops as soon as index k falls among the elements equal to the pivot. If too many partitions are
+# unbalanced the pivots are chosen using the median-of-medians, which keeps the worst case O(n).
+# No auxiliary arrays are allocated.
+##
+
+import unittest
+import random
+
+import quicksort
+import quicksort_3way
+
+
+# Slices of this length or shorter are finished using insertion sort.
+INSERTION_CUTOFF = 16
+
+# A partition is unbalanced if the side containing index k keeps more than 3/4 of the slice. After
+# this many unbalanced partitions pivots are chosen using the median-of-medians.
+UNBALANCED_LIMIT = 4
+
+
+# Returns the kth smallest element of `array`, counting from zero. The array is partially reordered
+# as by `nth_element()`.
+def select(array, k):
+    nth_element(array, k)
+    return array[k]
+
+
+# Rearranges `array` in place so that array[k] holds the element which would be there if the array
+# were sorted, every element before it is less than or equal to it, and every element after it is
+# greater than or equal to it.
+def nth_element(array, k):
+    if not 0 <= k < len(array):
+        raise IndexError("k is out of range")
+    introselect(array, k, 0, len(array) - 1)
+
+
+# Rearranges `array` in place so that array[0..k) holds the k smallest elements in sorted order.
+# The order of the remaining elements is unspecified.
+def partial_sort(array, k):
+    k = min(k, len(array))
+    if k <= 0:
+        return
+    nth_element(array, k - 1)
+    quicksort.quicksort(array, 0, k - 2)
+
+
+# Selects index `k` within the slice of `array` identified by the inclusive indices `l_index` and
+# `r_index`.
+def introselect(array, k, l_index, r_index):
+    l, r = l_index, r_index
+    unbalanced = 0
+    last_pivot = None
+
+    while r - l >= INSERTION_CUTOFF:
+        if unbalanced < UNBALANCED_LIMIT:
+            pivot = quicksort.choose_pivot(array, l, r)
+        else:
+            pivot = median_of_medians(array, l, r)
+        array[l], array[pivot] = array[pivot], array[l]
+        size = r - l + 1
+
+        item = array[l]
+        if last_pivot is not None and not (item < last_pivot or last_pivot < item):
+            lt, gt = quicksort_3way.partition3(array, l, r)
+        else:
+            lt = gt = quicksort.partition(array, l, r)
+        last_pivot = item
+
+        if k < lt:
+            r = lt - 1
+        elif k > gt:
+            l = gt + 1
+        else:
+            return
+
+        if r - l + 1 > 3 * size // 4:
+            unbalanced += 1
+    else:
+        quicksort.insertion_sort(array, l, r)
+
+
+# Returns the index of a pivot for the slice identified by the inclusive indices `l_index` and
+# `r_index` which is guaranteed to have at least 3/10 of the slice on each side. Each group of five
+# elements is sorted and its median is moved to the front of the slice, then the median of these
+# medians is selected recursively.
+def median_of_medians(array, l_index, r_index):
+    if r_index - l_index < 5:
+        quicksort.insertion_sort(array, l_index, r_index)
+        return l_index + (r_index - l_index) // 2
+
+    m = l_index
+    for low in range(l_index, r_index + 1, 5):
+        high = min(low + 4, r_index)
+        quicksort.insertion_sort(array, low, high)
+        median = low + (high - low) // 2
+        array[m], array[median] = array[median], array[m]
+        m += 1
+
+    mid = l_index + (m - 1 - l_index) // 2
+    introselect(array, mid, l_index, m - 1)
+    return mid
+
+
+class TestSelect(unittest.TestCase):
+
+    def arrays(self):
+        n = 1000
+        yield [random.random() for i in range(n)]
+        yield [i for i in range(n)]
+        yield [i for i in range(n, 0, -1)]
+        yield [1 for i in range(n)]
+        yield [random.randint(0, 5) for i in range(n)]
+        yield [i for i in range(n // 2)] + [i for i in range(n // 2, 0, -1)]
+
+    def check_nth_element(self, array, k):
+        self.assertTrue(all(x <= array[k] for x in array[:k]))
+        self.assertTrue(all(x >= array[k] for x in array[k + 1:]))
+
+    def test_select(self):
+        for test_array in self.arrays():
+            expected = sorted(test_array)
+            for k in [0, 1, 499, 500, 998, 999, random.randrange(1000)]:
+                self.assertEqual(select(test_array.copy(), k), expected[k])
+
+    def test_nth_element(self):
+        for test_array in self.arrays():
+            expected = sorted(test_array)
+            k = random.randrange(len(test_array))
+            nth_element(test_array, k)
+            self.assertEqual(test_array[k], expected[k])
+            self.check_nth_element(test_array, k)
+            self.assertEqual(sorted(test_array), expected)
+
+    def test_small(self):
+        for n in range(1, 40):
+            test_array = [random.randint(0, 10) for i in range(n)]
+            expected = sorted(test_array)
+            for k in range(n):
+                self.assertEqual(select(test_array.copy(), k), expected[k])
+
+    def test_partial_sort(self):
+        for test_array in self.arrays():
+            expected = sorted(test_array)
+            for k in [0, 1, 10, 100, 1000, 2000]:
+                copy = test_array.copy()
+                partial_sort(copy, k)
+                self.assertEqual(copy[:k], expected[:k])
+                self.assertEqual(sorted(copy), expected)
+
+    def test_median_of_medians(self):
+        for test_array in self.arrays():
+            pivot = test_array[median_of_medians(test_array, 0, len(test_array) - 1)]
+            less = sum(1 for x in test_array if x < pivot)
+            greater = sum(1 for x in test_array if x > pivot)
+            self.assertLessEqual(less, 7 * len(test_array) // 10)
+            self.assertLessEqual(greater, 7 * len(test_array) // 10)
+
+    def test_median_of_medians_fallback(self):
+        global UNBALANCED_LIMIT
+        UNBALANCED_LIMIT = 0
+        try:
+            for test_array in self.arrays():
+                expected = sorted(test_array)
+                k = random.randrange(len(test_array))
+                nth_element(test_array, k)
+                self.assertEqual(test_array[k], expected[k])
+                self.check_nth_element(test_array, k)
+        finally:
+            UNBALANCED_LIMIT = 4
+
+    def test_out_of_range(self):
+        with self.assertRaises(IndexError):
+            select([1, 2, 3], 3)
+        with self.assertRaises(IndexError):
+            select([], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,23 +1,138 @@
 #!/usr/bin/env python3
 ##
-# This module contains a reference implementation of the quicksort algorithm.
+# This module contains a reference implementation of the quicksort algorithm, implemented as an
+# introsort. Pivots are chosen using median-of-three or Tukey's ninther, small partitions are
+# finished with insertion sort, and any slice for which the partitioning depth exceeds 2*log(n)
+# is handed over to heapsort so the worst case remains O(n log n).
 ##
 
 import unittest
 import random
+import array as typed_array
 
+import buffers
+import heapsort
+import key_sort
+import numpy_backend
+
+
+# Partitions of this length or shorter are sorted using insertion sort.
+INSERTION_CUTOFF = 16
+
+# Partitions longer than this choose their pivot using Tukey's ninther.
+NINTHER_CUTOFF = 128
+
+# Set to true to collect partitioning statistics in `counters`.
+DEBUG = False
+
+counters = {}
+
+
+def reset_counters():
+    counters.update(partitions=0, unbalanced=0, heapsort_fallbacks=0, insertion_sorts=0)
+
+
+reset_counters()
+
+
+# Sorts `array` in place. If a `key` function is given it is called once per element. If `reverse`
+# is true the array is sorted in descending order.
+#
+# Quicksort is not stable: elements which compare equal may be reordered. Sorting with a key
+# is stable as the elements are placed by `key_sort.py`.
+#
+# If NumPy is installed, NumPy arrays and numeric `array.array` instances are sorted in place by
+# the vectorized 3-way quicksort in `numpy_backend.py`.
+def sort(array, key=None, reverse=False):
+    if key is not None:
+        key_sort.sort_with_key(sort, array, key, reverse)
+        return
+
+    view = numpy_backend.as_ndarray(array)
+    if view is not None:
+        numpy_backend.quicksort(view)
+        if reverse:
+            numpy_backend.reverse(view)
+        return
 
-def sort(array):
-    random.shuffle(array)
     quicksort(array, 0, len(array) - 1)
+    if reverse:
+        buffers.reverse(array)
 
 
-# Sorts the slice of `array` identified by the inclusive indices `l_index` and `r_index`.
+# Sorts the slice of `array` identified by the inclusive indices `l_index` and `r_index`. Pending
+# partitions are kept on an explicit stack rather than recursing. The larger side of each partition
+# is pushed and the smaller side is processed next so the stack stays O(log n) deep.
 def quicksort(array, l_index, r_index):
-    if l_index < r_index:
-        p = partition(array, l_index, r_index)
-        quicksort(array, l_index, p - 1)
-        quicksort(array, p + 1, r_index)
+    if r_index <= l_index:
+        return
+
+    stack = [(l_index, r_index, 2 * (r_index - l_index + 1).bit_length())]
+    while stack:
+        l, r, depth = stack.pop()
+        while r - l >= INSERTION_CUTOFF:
+            if depth == 0:
+                heapsort.dary_heapsort(array, l, r)
+                if DEBUG:
+                    counters["heapsort_fallbacks"] += 1
+                break
+            depth -= 1
+
+            pivot = choose_pivot(array, l, r)
+            array[l], array[pivot] = array[pivot], array[l]
+            p = partition(array, l, r)
+
+            if DEBUG:
+                counters["partitions"] += 1
+                if min(p - l, r - p) < (r - l + 1) // 8:
+                    counters["unbalanced"] += 1
+
+            if p - l < r - p:
+                stack.append((p + 1, r, depth))
+                r = p - 1
+            else:
+                stack.append((l, p - 1, depth))
+                l = p + 1
+        else:
+            insertion_sort(array, l, r)
+            if DEBUG:
+                counters["insertion_sorts"] += 1
+
+
+# Returns the index of the pivot for the slice identified by the inclusive indices `l_index` and
+# `r_index`: the median of three elements or, for long slices, the median of three medians.
+def choose_pivot(array, l_index, r_index):
+    mid = l_index + (r_index - l_index) // 2
+    if r_index - l_index + 1 <= NINTHER_CUTOFF:
+        return median_of_three(array, l_index, mid, r_index)
+    step = (r_index - l_index + 1) // 8
+    return median_of_three(array,
+        median_of_three(array, l_index, l_index + step, l_index + 2 * step),
+        median_of_three(array, mid - step, mid, mid + step),
+        median_of_three(array, r_index - 2 * step, r_index - step, r_index))
+
+
+# Returns whichever of the indices `i`, `j`, `k` holds the median of the three elements.
+def median_of_three(array, i, j, k):
+    a, b, c = array[i], array[j], array[k]
+    if a < b:
+        if b < c:
+            return j
+        return k if a < c else i
+    if a < c:
+        return i
+    return k if b < c else j
+
+
+# Sorts the slice of `array` identified by the inclusive indices `l_index` and `r_index`.
+def insertion_sort(array, l_index, r_index):
+    for i in range(l_index + 1, r_index + 1):
+        item = array[i]
+        j = i
+        while j > l_index and item < array[j - 1]:
+            array[j] = array[j - 1]
+            j -= 1
+        array[j] = item
 
 
 # Partitions the slice of `array` identified by the inclusive indices `l_index` and `r_index`.
@@ -59,6 +174,90 @@ class TestSort(unittest.TestCase):
         sort(test_array)
         self.assertTrue(is_sorted(test_array))
 
+    def test_key(self):
+        test_array = [random.randint(-500, 500) for i in range(1000)]
+        expected = sorted(test_array, key=abs)
+        sort(test_array, key=abs)
+        self.assertEqual(test_array, expected)
+
+    def test_reverse(self):
+        test_array = [random.randint(0, 50) for i in range(1000)]
+        expected = sorted(test_array, reverse=True)
+        sort(test_array, reverse=True)
+        self.assertEqual(test_array, expected)
+
+    def test_key_reverse(self):
+        test_array = [(random.randint(0, 20), i) for i in range(1000)]
+        expected = sorted(test_array, key=lambda pair: pair[0], reverse=True)
+        sort(test_array, key=lambda pair: pair[0], reverse=True)
+        self.assertEqual(test_array, expected)
+
+    def test_distributions(self):
+        n = 5000
+        arrays = [
+            [i for i in range(n)],
+            [i for i in range(n, 0, -1)],
+            [1 for i in range(n)],
+            [random.randint(0, 50) for i in range(n)],
+            [i for i in range(n // 2)] + [i for i in range(n // 2, 0, -1)],
+        ]
+        for test_array in arrays:
+            expected = sorted(test_array)
+            sort(test_array)
+            self.assertEqual(test_array, expected)
+
+    def test_small(self):
+        for n in range(40):
+            test_array = [random.randint(0, 10) for i in range(n)]
+            expected = sorted(test_array)
+            sort(test_array)
+            self.assertEqual(test_array, expected)
+
+    def test_slice(self):
+        test_array = [random.random() for i in range(1000)]
+        expected = test_array[:100] + sorted(test_array[100:900]) + test_array[900:]
+        quicksort(test_array, 100, 899)
+        self.assertEqual(test_array, expected)
+
+    def test_counters(self):
+        global DEBUG
+        DEBUG = True
+        reset_counters()
+        try:
+            sort([random.random() for i in range(1000)])
+        finally:
+            DEBUG = False
+        self.assertGreater(counters["partitions"], 0)
+        self.assertGreater(counters["insertion_sorts"], 0)
+        self.assertEqual(counters["heapsort_fallbacks"], 0)
+
+    @unittest.skipIf(numpy_backend.numpy is None, "NumPy is not installed")
+    def test_numeric_arrays(self):
+        numpy = numpy_backend.numpy
+        test_array = numpy.array([random.random() for i in range(1000)])
+        expected = numpy.sort(test_array)
+        sort(test_array)
+        self.assertTrue(numpy.array_equal(test_array, expected))
+        test_array = typed_array.array('i', [random.randint(-100, 100) for i in range(1000)])
+        expected = sorted(test_array, reverse=True)
+        sort(test_array, reverse=True)
+        self.assertEqual(test_array.tolist(), expected)
+
+    def test_typed_buffers(self):
+        # With NumPy disabled the buffers are sorted in place by the pure Python implementation.
+        numpy = numpy_backend.numpy
+        numpy_backend.numpy = None
+        try:
+            values = [random.randint(-100, 100) for i in range(1000)]
+            test_array = typed_array.array('i', values)
+            sort(test_array, reverse=True)
+            self.assertEqual(test_array.tolist(), sorted(values, reverse=True))
+            test_array = buffers.memoryview_of('d', values)
+            sort(test_array)
+            self.assertEqual(test_array.tolist(), sorted(values))
+        finally:
+            numpy_backend.numpy = numpy
+
 
 if __name__ == '__main__':
     unittest.main()
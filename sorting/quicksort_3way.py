@@ -3,15 +3,55 @@
 # This module contains a reference implementation of the quicksort algorithm with 3-way
 # partitioning. This algorithm is more efficient than standard quicksort for arrays with
 # large numbers of duplicate elements.
+#
+# It also contains a multikey quicksort (3-way radix quicksort) for strings and tuples. Rather than
+# comparing whole keys, each partition compares only the d-th character or element of each key
+# against the pivot's. The elements less than and greater than the pivot are partitioned again on
+# the same position, and the elements equal to it on the next position, so a prefix shared by many
+# keys is examined once per partition rather than once per comparison. Keys which end before
+# position d sort before all the keys which continue.
+#
+# Bentley, J. L. and Sedgewick, R. (1997) Fast algorithms for sorting and searching strings.
+# Proceedings of the 8th ACM-SIAM Symposium on Discrete Algorithms, 360-369.
 ##
 
 import unittest
 import random
+import array as typed_array
 
+import buffers
+import key_sort
+import numpy_backend
+
+
+# In multikey quicksort slices shorter than this are finished using insertion sort.
+MULTIKEY_CUTOFF = 10
+
+
+# Sorts `array` in place. If a `key` function is given it is called once per element. If `reverse`
+# is true the array is sorted in descending order.
+#
+# 3-way quicksort is not stable: elements which compare equal may be reordered. Sorting with a
+# key is stable as the elements are placed by `key_sort.py`.
+#
+# If NumPy is installed, NumPy arrays and numeric `array.array` instances are sorted in place by
+# the vectorized 3-way quicksort in `numpy_backend.py`.
+def sort(array, key=None, reverse=False):
+    if key is not None:
+        key_sort.sort_with_key(sort, array, key, reverse)
+        return
+
+    view = numpy_backend.as_ndarray(array)
+    if view is not None:
+        numpy_backend.quicksort(view)
+        if reverse:
+            numpy_backend.reverse(view)
+        return
 
-def sort(array):
     random.shuffle(array)
     quicksort3(array, 0, len(array) - 1)
+    if reverse:
+        buffers.reverse(array)
 
 
 # Sorts the slice of `array` identified by the inclusive indices `l_index` and `r_index`.
@@ -19,6 +59,15 @@ def quicksort3(array, l_index, r_index):
     if r_index <= l_index:
         return
 
+    lt, gt = partition3(array, l_index, r_index)
+    quicksort3(array, l_index, lt - 1)
+    quicksort3(array, gt + 1, r_index)
+
+
+# Partitions the slice of `array` identified by the inclusive indices `l_index` and `r_index`
+# around the pivot array[l_index]. Returns the indices `lt` and `gt` such that the elements in
+# array[lt..gt] are equal to the pivot, those before `lt` are less, and those after `gt` are greater.
+def partition3(array, l_index, r_index):
     lt = l_index
     gt = r_index
     i = l_index + 1
@@ -35,8 +84,84 @@ def quicksort3(array, l_index, r_index):
         else:
             i += 1
 
-    quicksort3(array, l_index, lt - 1)
-    quicksort3(array, gt + 1, r_index)
+    return lt, gt
+
+
+# Sorts `array` in place using multikey quicksort. The elements (or keys, if a `key` function is
+# given) must all be strings or all be tuples. If `reverse` is true the array is sorted in
+# descending order. Sorting with a key is stable; sorting without one is not.
+def multikey_sort(array, key=None, reverse=False):
+    if key is not None:
+        key_sort.sort_with_key(multikey_sort, array, key, reverse)
+        return
+    random.shuffle(array)
+    multikey_quicksort(array, 0, len(array) - 1, 0)
+    if reverse:
+        buffers.reverse(array)
+
+
+# Sorts the slice of `array` identified by the inclusive indices `l_index` and `r_index`, given that
+# its elements all agree on their first `d` characters or elements.
+def multikey_quicksort(array, l_index, r_index, d):
+    while r_index - l_index >= MULTIKEY_CUTOFF:
+        lt, gt = partition3_at(array, l_index, r_index, d)
+        if lt == l_index and gt == r_index and len(array[lt]) > d:
+            # Every key continues the shared prefix. Skip to the end of it rather than partitioning
+            # once per shared character.
+            d = common_prefix_length(array, l_index, r_index, d + 1)
+            continue
+        multikey_quicksort(array, l_index, lt - 1, d)
+        multikey_quicksort(array, gt + 1, r_index, d)
+
+        # Keys equal to a pivot which has ended are equal in full.
+        if len(array[lt]) <= d:
+            return
+        l_index, r_index, d = lt, gt, d + 1
+
+    # The slice is short and its keys share a prefix, so whole keys are compared.
+    for i in range(l_index + 1, r_index + 1):
+        item = array[i]
+        j = i
+        while j > l_index and item < array[j - 1]:
+            array[j] = array[j - 1]
+            j -= 1
+        array[j] = item
+
+
+# Returns the length of the prefix shared by every element of the slice of `array` identified by the
+# inclusive indices `l_index` and `r_index`, given that they share the first `d` characters or
+# elements. A prefix shared by the smallest and largest elements is shared by all of them.
+def common_prefix_length(array, l_index, r_index, d):
+    part = array[l_index:r_index + 1]
+    low, high = min(part), max(part)
+    n = min(len(low), len(high))
+    while d < n and low[d] == high[d]:
+        d += 1
+    return d
+
+
+# As partition3() but compares only the character or element at position `d` of each key. The
+# length-1 slice key[d:d + 1] is empty for a key which has ended, and the empty slice is less than
+# every other.
+def partition3_at(array, l_index, r_index, d):
+    lt = l_index
+    gt = r_index
+    i = l_index + 1
+    pivot = array[l_index][d:d + 1]
+
+    while i <= gt:
+        digit = array[i][d:d + 1]
+        if digit < pivot:
+            array[lt], array[i] = array[i], array[lt]
+            lt += 1
+            i += 1
+        elif digit > pivot:
+            array[i], array[gt] = array[gt], array[i]
+            gt -= 1
+        else:
+            i += 1
+
+    return lt, gt
 
 
 # Returns true if the input is empty, of length 1, or sorted in ascending order.
@@ -56,6 +181,80 @@ class TestSort(unittest.TestCase):
         sort(test_array)
         self.assertTrue(is_sorted(test_array))
 
+    def test_key(self):
+        test_array = [random.randint(-500, 500) for i in range(1000)]
+        expected = sorted(test_array, key=abs)
+        sort(test_array, key=abs)
+        self.assertEqual(test_array, expected)
+
+    def test_reverse(self):
+        test_array = [random.randint(0, 50) for i in range(1000)]
+        expected = sorted(test_array, reverse=True)
+        sort(test_array, reverse=True)
+        self.assertEqual(test_array, expected)
+
+    def test_key_reverse(self):
+        test_array = [(random.randint(0, 20), i) for i in range(1000)]
+        expected = sorted(test_array, key=lambda pair: pair[0], reverse=True)
+        sort(test_array, key=lambda pair: pair[0], reverse=True)
+        self.assertEqual(test_array, expected)
+
+    def test_multikey_strings(self):
+        prefixes = ["https://example.com/", "https://example.org/a/", "/usr/lib/", ""]
+        test_array = [random.choice(prefixes) + str(random.randint(0, 500)) for i in range(3000)]
+        test_array += ["", "h", "https", "https://example.com/"]
+        expected = sorted(test_array)
+        multikey_sort(test_array)
+        self.assertEqual(test_array, expected)
+        multikey_sort(test_array, reverse=True)
+        self.assertEqual(test_array, expected[::-1])
+
+    def test_common_prefix_length(self):
+        test_array = ["abcd", "abce", "abc", "abcdef"]
+        self.assertEqual(common_prefix_length(test_array, 0, 3, 0), 3)
+        self.assertEqual(common_prefix_length(test_array, 0, 1, 1), 3)
+        self.assertEqual(common_prefix_length([(1, 2, 3), (1, 2)], 0, 1, 0), 2)
+
+    def test_multikey_tuples(self):
+        test_array = [tuple(random.randint(0, 3) for j in range(random.randint(0, 6)))
+            for i in range(3000)]
+        expected = sorted(test_array)
+        multikey_sort(test_array)
+        self.assertEqual(test_array, expected)
+
+    def test_multikey_key_is_stable(self):
+        test_array = [(str(random.randint(0, 50)), i) for i in range(1000)]
+        expected = sorted(test_array, key=lambda pair: pair[0])
+        multikey_sort(test_array, key=lambda pair: pair[0])
+        self.assertEqual(test_array, expected)
+
+    @unittest.skipIf(numpy_backend.numpy is None, "NumPy is not installed")
+    def test_numeric_arrays(self):
+        numpy = numpy_backend.numpy
+        test_array = numpy.array([random.random() for i in range(1000)])
+        expected = numpy.sort(test_array)
+        sort(test_array)
+        self.assertTrue(numpy.array_equal(test_array, expected))
+        test_array = typed_array.array('i', [random.randint(-100, 100) for i in range(1000)])
+        expected = sorted(test_array, reverse=True)
+        sort(test_array, reverse=True)
+        self.assertEqual(test_array.tolist(), expected)
+
+    def test_typed_buffers(self):
+        # With NumPy disabled the buffers are sorted in place by the pure Python implementation.
+        numpy = numpy_backend.numpy
+        numpy_backend.numpy = None
+        try:
+            values = [random.randint(-100, 100) for i in range(1000)]
+            test_array = typed_array.array('i', values)
+            sort(test_array, reverse=True)
+            self.assertEqual(test_array.tolist(), sorted(values, reverse=True))
+            test_array = buffers.memoryview_of('d', values)
+            sort(test_array)
+            self.assertEqual(test_array.tolist(), sorted(values))
+        finally:
+            numpy_backend.numpy = numpy
+
 
 if __name__ == '__main__':
     unittest.main()
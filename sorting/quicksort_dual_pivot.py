@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+##
+# This module contains a reference implementation of Yaroslavskiy's dual-pivot quicksort. Each
+# partitioning step splits the slice into three parts around two pivots p <= q: elements less than
+# p, elements between p and q, and elements greater than q. This takes fewer swaps than Dijkstra's
+# 3-way partitioning on arrays of distinct keys.
+#
+# If the two pivots are equal the slice is handed to the 3-way quicksort from `quicksort_3way.py`
+# which handles runs of duplicate keys efficiently.
+##
+
+import unittest
+import random
+import array as typed_array
+
+import buffers
+import quicksort_3way
+
+
+# Slices of this length or shorter are sorted using insertion sort.
+INSERTION_CUTOFF = 16
+
+
+def sort(array):
+    random.shuffle(array)
+    quicksort_dual(array, 0, len(array) - 1)
+
+
+# Sorts the slice of `array` identified by the inclusive indices `l_index` and `r_index`.
+def quicksort_dual(array, l_index, r_index):
+    if r_index - l_index < INSERTION_CUTOFF:
+        insertion_sort(array, l_index, r_index)
+        return
+
+    if array[r_index] < array[l_index]:
+        array[l_index], array[r_index] = array[r_index], array[l_index]
+    p, q = array[l_index], array[r_index]
+
+    # Equal keys fast path.
+    if not p < q:
+        quicksort_3way.quicksort3(array, l_index, r_index)
+        return
+
+    lt, gt, i = l_index + 1, r_index - 1, l_index + 1
+    while i <= gt:
+        if array[i] < p:
+            array[i], array[lt] = array[lt], array[i]
+            lt += 1
+        elif q < array[i]:
+            while q < array[gt] and i < gt:
+                gt -= 1
+            array[i], array[gt] = array[gt], array[i]
+            gt -= 1
+            if array[i] < p:
+                array[i], array[lt] = array[lt], array[i]
+                lt += 1
+        i += 1
+
+    # Move the pivots into their final positions.
+    lt -= 1
+    gt += 1
+    array[l_index], array[lt] = array[lt], array[l_index]
+    array[r_index], array[gt] = array[gt], array[r_index]
+
+    quicksort_dual(array, l_index, lt - 1)
+    quicksort_dual(array, gt + 1, r_index)
+
+    # If the middle part is large it probably contains many keys equal to one of the pivots. These
+    # are moved out to the ends of the middle part and excluded from the recursive sort.
+    low, high = lt + 1, gt - 1
+    if high - low > 2 * (r_index - l_index) // 3:
+        i = low
+        while i <= high:
+            if not p < array[i]:
+                array[i], array[low] = array[low], array[i]
+                low += 1
+            elif not array[i] < q:
+                while not array[high] < q and i < high:
+                    high -= 1
+                array[i], array[high] = array[high], array[i]
+                high -= 1
+                if not p < array[i]:
+                    array[i], array[low] = array[low], array[i]
+                    low += 1
+            i += 1
+
+    quicksort_dual(array, low, high)
+
+
+# Sorts the slice of `array` identified by the inclusive indices `l_index` and `r_index`.
+def insertion_sort(array, l_index, r_index):
+    for i in range(l_index + 1, r_index + 1):
+        item = array[i]
+        j = i
+        while j > l_index and item < array[j - 1]:
+            array[j] = array[j - 1]
+            j -= 1
+        array[j] = item
+
+
+# Returns true if the input is empty, of length 1, or sorted in ascending order.
+def is_sorted(array):
+    for index in range(1, len(array)):
+        if array[index] < array[index - 1]:
+            return False
+    return True
+
+
+class TestSort(unittest.TestCase):
+
+    def test_sort(self):
+        test_array = [i for i in range(1000)]
+        while is_sorted(test_array):
+            random.shuffle(test_array)
+        sort(test_array)
+        self.assertTrue(is_sorted(test_array))
+
+    def test_distributions(self):
+        n = 5000
+        arrays = [
+            [i for i in range(n)],
+            [1 for i in range(n)],
+            [random.randint(0, 50) for i in range(n)],
+            [random.randint(0, 1) for i in range(n)],
+            [random.random() for i in range(n)],
+        ]
+        for test_array in arrays:
+            expected = sorted(test_array)
+            sort(test_array)
+            self.assertEqual(test_array, expected)
+
+    def test_small(self):
+        for n in range(40):
+            test_array = [random.randint(0, 10) for i in range(n)]
+            expected = sorted(test_array)
+            sort(test_array)
+            self.assertEqual(test_array, expected)
+
+    def test_typed_buffers(self):
+        values = [random.randint(-100, 100) for i in range(1000)]
+        test_array = typed_array.array('i', values)
+        sort(test_array)
+        self.assertEqual(test_array.tolist(), sorted(values))
+        test_array = buffers.memoryview_of('d', values)
+        sort(test_array)
+        self.assertEqual(test_array.tolist(), sorted(values))
+
+
+if __name__ == '__main__':
+    unittest.main()
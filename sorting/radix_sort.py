@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+##
+# This module contains reference implementations of LSD (least-significant-digit-first) radix sort
+# for integers and MSD (most-significant-digit-first) radix sort for strings and byte strings.
+# Neither algorithm compares keys directly so both avoid the O(n log n) lower bound on comparison
+# sorts.
+#
+# LSD sort uses 8-bit digits and a single preallocated count array. MSD sort uses one character per
+# digit and counts only the characters which occur in each bucket. Both sorts use one auxiliary
+# buffer of the same type and length as the input, and both are stable.
+##
+
+import unittest
+import random
+import array as typed_array
+
+import buffers
+
+
+# Number of values a single digit can take for integer and byte string keys.
+RADIX = 256
+
+# Buckets of this length or shorter are sorted using insertion sort.
+INSERTION_CUTOFF = 16
+
+
+# Sorts an array of integers, strings, or byte strings.
+def sort(array):
+    if len(array) < 2:
+        return
+    if isinstance(array[0], (str, bytes)):
+        msd_sort(array)
+    else:
+        lsd_sort(array)
+
+
+# Sorts an array of integers. Negative values are handled by sorting on the offset from the minimum
+# value, which also means the number of passes depends only on the range of the values. Raises a
+# TypeError if the elements aren't integers.
+def lsd_sort(array):
+    n = len(array)
+    if n <= INSERTION_CUTOFF:
+        insertion_sort(array, 0, n)
+        return
+
+    low = min(array)
+    span = max(array) - low
+    if not isinstance(span, int):
+        raise TypeError("lsd_sort requires integer elements")
+    passes = (span.bit_length() + 7) // 8
+
+    aux = buffers.copy(array)
+    count = [0] * (RADIX + 1)
+    zeros = [0] * (RADIX + 1)
+
+    # Each pass distributes from `src` into `dst`, then the buffers swap roles.
+    src, dst = array, aux
+    shift = 0
+    for _ in range(passes):
+        count[:] = zeros
+        for x in src:
+            count[((x - low) >> shift & 0xFF) + 1] += 1
+
+        # Skip the pass if every element has the same digit.
+        if max(count) < n:
+            for r in range(RADIX):
+                count[r + 1] += count[r]
+            for x in src:
+                digit = (x - low) >> shift & 0xFF
+                dst[count[digit]] = x
+                count[digit] += 1
+            src, dst = dst, src
+        shift += 8
+
+    if src is not array:
+        array[:] = src
+
+
+# Sorts an array of strings or an array of byte strings. The characters of a string are its code
+# points and the characters of a byte string are its bytes. Shorter keys sort before longer keys
+# with the same prefix.
+def msd_sort(array):
+    n = len(array)
+    if n < 2:
+        return
+
+    is_str = isinstance(array[0], str)
+    aux = buffers.copy(array)
+    digits = [0] * n
+
+    # Pending buckets: the half-open slice array[lo..hi) whose keys share their first `d` characters.
+    stack = [(0, n, 0)]
+    while stack:
+        lo, hi, d = stack.pop()
+        if hi - lo <= INSERTION_CUTOFF:
+            insertion_sort(array, lo, hi)
+            continue
+
+        # Keys which end before character `d` get digit 0 so they sort first. Only the digits which
+        # occur in the bucket are counted, so the cost doesn't depend on the largest code point.
+        count = {}
+        for i in range(lo, hi):
+            key = array[i]
+            if d < len(key):
+                digit = ord(key[d]) + 1 if is_str else key[d] + 1
+            else:
+                digit = 0
+            digits[i] = digit
+            count[digit] = count.get(digit, 0) + 1
+
+        # Convert the counts to the position of the first key with each digit.
+        buckets = []
+        total = 0
+        for digit in sorted(count):
+            buckets.append((digit, lo + total, lo + total + count[digit]))
+            total, count[digit] = total + count[digit], total
+
+        for i in range(lo, hi):
+            digit = digits[i]
+            aux[count[digit]] = array[i]
+            count[digit] += 1
+        array[lo:hi] = aux[:hi - lo]
+
+        # The bucket of keys which have ended is already sorted.
+        for digit, start, end in buckets:
+            if digit and end - start > 1:
+                stack.append((start, end, d + 1))
+
+
+# Sorts the half-open slice array[lo..hi).
+def insertion_sort(array, lo, hi):
+    for i in range(lo + 1, hi):
+        item = array[i]
+        j = i
+        while j > lo and item < array[j - 1]:
+            array[j] = array[j - 1]
+            j -= 1
+        array[j] = item
+
+
+# Returns true if the input is empty, of length 1, or sorted in ascending order.
+def is_sorted(array):
+    for index in range(1, len(array)):
+        if array[index] < array[index - 1]:
+            return False
+    return True
+
+
+class TestSort(unittest.TestCase):
+
+    def test_sort(self):
+        test_array = [i for i in range(1000)]
+        while is_sorted(test_array):
+            random.shuffle(test_array)
+        sort(test_array)
+        self.assertTrue(is_sorted(test_array))
+
+    def test_lsd_negative(self):
+        for bits in [4, 16, 32, 64, 100]:
+            test_array = [random.randint(-2**(bits - 1), 2**(bits - 1) - 1) for i in range(1000)]
+            expected = sorted(test_array)
+            lsd_sort(test_array)
+            self.assertEqual(test_array, expected)
+
+    def test_lsd_small(self):
+        for n in range(20):
+            test_array = [random.randint(-5, 5) for i in range(n)]
+            expected = sorted(test_array)
+            lsd_sort(test_array)
+            self.assertEqual(test_array, expected)
+
+    def test_lsd_uniform(self):
+        test_array = [7 for i in range(1000)]
+        lsd_sort(test_array)
+        self.assertEqual(test_array, [7 for i in range(1000)])
+
+    def test_msd_strings(self):
+        words = ["", "a", "ab", "abc", "b", "ba", "été", "中文", "zz"]
+        test_array = [random.choice(words) + random.choice(words) for i in range(1000)]
+        expected = sorted(test_array)
+        msd_sort(test_array)
+        self.assertEqual(test_array, expected)
+
+    def test_msd_non_bmp(self):
+        # A single astral code point must not make every bucket scan the whole of Unicode.
+        test_array = [str(random.randint(0, 10**6)) for i in range(20000)]
+        test_array += ["\U0001F600", "1\U0010FFFF"]
+        random.shuffle(test_array)
+        expected = sorted(test_array)
+        msd_sort(test_array)
+        self.assertEqual(test_array, expected)
+
+    def test_msd_urls(self):
+        test_array = [f"https://example.com/{random.randint(0, 99)}/{random.randint(0, 999)}"
+            for i in range(1000)]
+        expected = sorted(test_array)
+        sort(test_array)
+        self.assertEqual(test_array, expected)
+
+    def test_msd_bytes(self):
+        test_array = [random.randbytes(random.randint(0, 6)) for i in range(1000)]
+        expected = sorted(test_array)
+        sort(test_array)
+        self.assertEqual(test_array, expected)
+
+    def test_typed_buffers(self):
+        values = [random.randint(-2**31, 2**31 - 1) for i in range(1000)]
+        test_array = typed_array.array('l', values)
+        sort(test_array)
+        self.assertEqual(test_array.tolist(), sorted(values))
+        test_array = buffers.memoryview_of('h', [v >> 16 for v in values])
+        sort(test_array)
+        self.assertEqual(test_array.tolist(), sorted(v >> 16 for v in values))
+        test_array = memoryview(bytearray(random.randbytes(1000))).cast('c')
+        expected = sorted(test_array.tolist())
+        sort(test_array)
+        self.assertEqual(test_array.tolist(), expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
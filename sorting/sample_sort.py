@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+##
+# This module contains a parallel sample sort. A random sample of the input is sorted and every
+# `oversampling`th element of the sample is taken as a splitter, giving one bucket per worker. A
+# single pass moves each element into its bucket, the buckets are sorted in separate processes
+# using the 3-way quicksort from `quicksort_3way.py`, and as the buckets are already in order no
+# merge step is needed.
+#
+# Each splitter also gets a bucket of its own for the elements equal to it. These buckets are
+# already sorted, so a value which fills a large part of the input (as in the 'uni' and 'dup'
+# distributions) ends up in a bucket which needs no work rather than in one overloaded worker.
+#
+# Arrays of plain ints or floats, `array.array` instances and memoryviews are distributed into a
+# shared memory block and each worker sorts its bucket of the block in place. Other arrays are
+# pickled out to the workers bucket by bucket.
+##
+
+import unittest
+import random
+import os
+import bisect
+import struct
+import array as typed_array
+from multiprocessing import Pool, shared_memory
+
+import buffers
+import parallel_mergesort
+import quicksort_3way
+
+
+# Inputs shorter than this are sorted serially as process startup would dominate the runtime.
+THRESHOLD = 50_000
+
+# Number of sample elements drawn per bucket.
+OVERSAMPLING = 32
+
+
+def sort(array):
+    sample_sort(array)
+
+
+def sample_sort(array, workers=None, threshold=THRESHOLD, oversampling=OVERSAMPLING):
+    n = len(array)
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers < 2 or n < max(threshold, 2 * workers):
+        quicksort_3way.sort(array)
+        return
+
+    splitters = choose_splitters(array, workers, oversampling)
+    ids, bounds = classify(array, splitters)
+
+    # Buckets of elements equal to a splitter, and buckets of fewer than two elements, are sorted.
+    tasks = [(low, high) for b, (low, high) in enumerate(bounds) if b % 2 == 0 and high - low > 1]
+    tasks.sort(key=lambda task: task[0] - task[1])
+
+    typecode = parallel_mergesort.numeric_typecode(array)
+    if typecode is None:
+        aux = [None] * n
+        scatter(array, ids, bounds, aux)
+        with Pool(workers) as pool:
+            runs = pool.map(sort_bucket, [aux[low:high] for low, high in tasks], chunksize=1)
+        for (low, high), run in zip(tasks, runs):
+            aux[low:high] = run
+        buffers.assign(array, aux)
+        return
+
+    itemsize = struct.calcsize(typecode)
+    shm = shared_memory.SharedMemory(create=True, size=n * itemsize)
+    try:
+        view = shm.buf[:n * itemsize].cast(typecode)
+        scatter(array, ids, bounds, view)
+        with Pool(workers) as pool:
+            pool.starmap(sort_shared_bucket, [(shm.name, typecode, n, low, high)
+                for low, high in tasks], chunksize=1)
+        if isinstance(array, typed_array.array):
+            with memoryview(array) as out:
+                out[:] = view
+        else:
+            array[:] = view
+        view.release()
+    finally:
+        shm.close()
+        shm.unlink()
+
+
+# Returns the sorted list of distinct splitters for `p` buckets, chosen from a random sample of
+# `p * oversampling` elements of `array`.
+def choose_splitters(array, p, oversampling):
+    n = len(array)
+    sample = [array[i] for i in random.sample(range(n), min(p * oversampling, n))]
+    quicksort_3way.sort(sample)
+    step = len(sample) / p
+    splitters = []
+    for i in range(1, p):
+        candidate = sample[int(i * step)]
+        if not splitters or splitters[-1] < candidate:
+            splitters.append(candidate)
+    return splitters
+
+
+# Assigns each element of `array` to a bucket. With k splitters there are 2k + 1 buckets: bucket
+# 2i holds the elements between splitters i - 1 and i, and bucket 2i + 1 holds the elements equal
+# to splitter i. Returns the bucket index of each element and the half-open bounds of each bucket
+# in the output.
+def classify(array, splitters):
+    k = len(splitters)
+    ids = typed_array.array('L', bytes(len(array) * typed_array.array('L').itemsize))
+    counts = [0] * (2 * k + 1)
+    for index, item in enumerate(array):
+        i = bisect.bisect_left(splitters, item)
+        b = 2 * i
+        if i < k and not item < splitters[i]:
+            b += 1
+        ids[index] = b
+        counts[b] += 1
+
+    bounds = []
+    low = 0
+    for count in counts:
+        bounds.append((low, low + count))
+        low += count
+    return ids, bounds
+
+
+# Moves each element of `array` into its bucket in `out`, keeping the elements of each bucket in
+# their original order.
+def scatter(array, ids, bounds, out):
+    next_slot = [low for low, high in bounds]
+    for index, item in enumerate(array):
+        b = ids[index]
+        out[next_slot[b]] = item
+        next_slot[b] += 1
+
+
+# Worker: sorts a bucket which has been pickled across from the parent process.
+def sort_bucket(bucket):
+    quicksort_3way.sort(bucket)
+    return bucket
+
+
+# Worker: sorts the slice [low..high) of the shared memory block `name` in place.
+def sort_shared_bucket(name, typecode, n, low, high):
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        view = shm.buf[:n * struct.calcsize(typecode)].cast(typecode)
+        bucket = view[low:high]
+        quicksort_3way.sort(bucket)
+        bucket.release()
+        view.release()
+    finally:
+        shm.close()
+
+
+# Returns true if the input is empty, of length 1, or sorted in ascending order.
+def is_sorted(array):
+    for index in range(1, len(array)):
+        if array[index] < array[index - 1]:
+            return False
+    return True
+
+
+class TestSort(unittest.TestCase):
+
+    def test_sort(self):
+        test_array = [i for i in range(1000)]
+        while is_sorted(test_array):
+            random.shuffle(test_array)
+        sort(test_array)
+        self.assertTrue(is_sorted(test_array))
+
+    def test_parallel(self):
+        n = 5000
+        arrays = [
+            [random.randint(-1000, 1000) for i in range(n)],
+            [random.random() for i in range(n)],
+            [str(random.randint(0, 10000)) for i in range(n)],
+            [1 for i in range(n)],
+            [random.randint(0, 50) for i in range(n)],
+            [i for i in range(n, 0, -1)],
+        ]
+        for test_array in arrays:
+            expected = sorted(test_array)
+            sample_sort(test_array, workers=4, threshold=0)
+            self.assertEqual(test_array, expected)
+
+    def test_parallel_typed_buffers(self):
+        values = [random.randint(-1000, 1000) for i in range(5000)]
+        test_array = typed_array.array('i', values)
+        sample_sort(test_array, workers=4, threshold=0)
+        self.assertEqual(test_array.tolist(), sorted(values))
+        test_array = buffers.memoryview_of('d', values)
+        sample_sort(test_array, workers=3, threshold=0)
+        self.assertEqual(test_array.tolist(), sorted(values))
+
+    def test_parallel_unshared_buffers(self):
+        # Buffers which can't be copied into shared memory are pickled out to the workers.
+        values = [random.choice("abcdefgh") for i in range(2000)]
+        test_array = typed_array.array('u', values)
+        sample_sort(test_array, workers=2, threshold=0)
+        self.assertEqual(test_array.tolist(), sorted(values))
+        values = [random.randint(-1000, 1000) for i in range(4000)]
+        test_array = buffers.memoryview_of('q', values)[::2]
+        sample_sort(test_array, workers=2, threshold=0)
+        self.assertEqual(test_array.tolist(), sorted(values[::2]))
+
+    def test_balanced_buckets(self):
+        # Apart from the buckets of elements equal to a splitter, no bucket should be much larger
+        # than n/p, however skewed the input.
+        n, p = 20000, 8
+        arrays = [
+            [random.random() for i in range(n)],
+            [1 for i in range(n)],
+            [random.randint(0, 50) for i in range(n)],
+            [0 if random.random() < 0.9 else random.random() for i in range(n)],
+            [int(random.expovariate(1.0) * 100) for i in range(n)],
+        ]
+        for test_array in arrays:
+            splitters = choose_splitters(test_array, p, OVERSAMPLING)
+            ids, bounds = classify(test_array, splitters)
+            largest = max(high - low for b, (low, high) in enumerate(bounds) if b % 2 == 0)
+            self.assertLess(largest, 2 * n // p)
+
+            out = [None] * n
+            scatter(test_array, ids, bounds, out)
+            for b, (low, high) in enumerate(bounds):
+                if b % 2 == 1:
+                    self.assertTrue(all(x == splitters[b // 2] for x in out[low:high]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,27 +1,135 @@
 #!/usr/bin/env python3
 ##
 # This module contains a reference implementation of the shellsort algorithm.
+#
+# The gap sequence is pluggable. `GAP_SEQUENCES` maps the name of each built-in sequence to a
+# function which returns the gaps to use for an array of length n, largest first and ending with 1:
+#
+#   knuth       1, 4, 13, 40, ...        (3^k - 1) / 2
+#   sedgewick   1, 8, 23, 77, 281, ...   4^k + 3*2^(k-1) + 1
+#   tokuda      1, 4, 9, 20, 46, ...     ceil((9*(9/4)^k - 4) / 5)
+#   ciura       1, 4, 10, 23, 57, ...    Ciura's empirical sequence, extended by a factor of 2.25
+#
+# `tune()` times each sequence on sample data of a given size and returns the fastest.
 ##
 
 import unittest
 import random
+import math
+import time
+import statistics
+import array as typed_array
 
+import buffers
+import key_sort
 
-def sort(array):
-    h = 1
-    while h < len(array) // 3:
-        h = h * 3 + 1
 
-    while h >= 1:
+# The gap sequence used when none is given.
+DEFAULT_GAPS = "ciura"
+
+
+# Sorts `array` in place. If a `key` function is given it is called once per element. If `reverse`
+# is true the array is sorted in descending order. The `gaps` argument is the name of a sequence in
+# `GAP_SEQUENCES` or a function taking the array length and returning the gaps, largest first.
+#
+# Shellsort is not stable: elements which compare equal may be reordered. Sorting with a key is
+# stable as the elements are placed by `key_sort.py`.
+def sort(array, key=None, reverse=False, gaps=DEFAULT_GAPS):
+    if isinstance(gaps, str):
+        if gaps not in GAP_SEQUENCES:
+            raise ValueError(f"unknown gap sequence: {gaps}")
+        gaps = GAP_SEQUENCES[gaps]
+    if key is not None:
+        key_sort.sort_with_key(lambda keys: sort(keys, gaps=gaps), array, key, reverse)
+        return
+
+    for h in gaps(len(array)):
+        # An insertion sort on each h-spaced subsequence, shifting elements into a hole.
         for i in range(h, len(array)):
+            item = array[i]
             j = i
             while j >= h:
-                if array[j - h] > array[j]:
-                    array[j - h], array[j] = array[j], array[j - h]
-                else:
+                value = array[j - h]
+                if not item < value:
                     break
+                array[j] = value
                 j -= h
-        h = h // 3
+            array[j] = item
+    if reverse:
+        buffers.reverse(array)
+
+
+def knuth_gaps(n):
+    gaps = [1]
+    while gaps[-1] < n // 3:
+        gaps.append(gaps[-1] * 3 + 1)
+    return gaps[::-1]
+
+
+def sedgewick_gaps(n):
+    gaps = [1]
+    k = 1
+    while True:
+        h = 4 ** k + 3 * 2 ** (k - 1) + 1
+        if h >= n:
+            break
+        gaps.append(h)
+        k += 1
+    return gaps[::-1]
+
+
+def tokuda_gaps(n):
+    gaps = [1]
+    k = 1
+    while True:
+        h = math.ceil((9 * (9 / 4) ** k - 4) / 5)
+        if h >= n:
+            break
+        gaps.append(h)
+        k += 1
+    return gaps[::-1]
+
+
+# Ciura's sequence was found experimentally and is only known up to 1750. Longer arrays extend it
+# with the ratio of its last few terms.
+CIURA = [1, 4, 10, 23, 57, 132, 301, 701, 1750]
+
+
+def ciura_gaps(n):
+    gaps = [h for h in CIURA if h < n] or [1]
+    if gaps[-1] == CIURA[-1]:
+        h = int(gaps[-1] * 2.25)
+        while h < n:
+            gaps.append(h)
+            h = int(h * 2.25)
+    return gaps[::-1]
+
+
+GAP_SEQUENCES = {
+    "knuth": knuth_gaps,
+    "sedgewick": sedgewick_gaps,
+    "tokuda": tokuda_gaps,
+    "ciura": ciura_gaps,
+}
+
+
+# Times shellsort with each of the named gap sequences on arrays of length `n`, by default the length
+# of the list `sample`. If `n` differs from the sample's length the array is drawn from `sample` with
+# replacement, so it has the same distribution of values but not necessarily the same order. Returns
+# the name of the fastest sequence and a dictionary mapping each name to its median time in seconds.
+def tune(sample, n=None, candidates=None, repeat=3):
+    if n is not None and n != len(sample):
+        sample = random.choices(sample, k=n)
+    timings = {}
+    for name in candidates or GAP_SEQUENCES:
+        times = []
+        for i in range(repeat):
+            array = list(sample)
+            start = time.perf_counter()
+            sort(array, gaps=name)
+            times.append(time.perf_counter() - start)
+        timings[name] = statistics.median(times)
+    return min(timings, key=timings.get), timings
 
 
 # Returns true if the input is empty, of length 1, or sorted in ascending order.
@@ -41,6 +149,77 @@ class TestSort(unittest.TestCase):
         sort(test_array)
         self.assertTrue(is_sorted(test_array))
 
+    def test_key(self):
+        test_array = [random.randint(-500, 500) for i in range(1000)]
+        expected = sorted(test_array, key=abs)
+        sort(test_array, key=abs)
+        self.assertEqual(test_array, expected)
+
+    def test_reverse(self):
+        test_array = [random.randint(0, 50) for i in range(1000)]
+        expected = sorted(test_array, reverse=True)
+        sort(test_array, reverse=True)
+        self.assertEqual(test_array, expected)
+
+    def test_key_reverse(self):
+        test_array = [(random.randint(0, 20), i) for i in range(1000)]
+        expected = sorted(test_array, key=lambda pair: pair[0], reverse=True)
+        sort(test_array, key=lambda pair: pair[0], reverse=True)
+        self.assertEqual(test_array, expected)
+
+    def test_gap_sequences(self):
+        self.assertEqual(knuth_gaps(1000)[::-1][:5], [1, 4, 13, 40, 121])
+        self.assertEqual(sedgewick_gaps(1000)[::-1], [1, 8, 23, 77, 281])
+        self.assertEqual(tokuda_gaps(1000)[::-1], [1, 4, 9, 20, 46, 103, 233, 525])
+        self.assertEqual(ciura_gaps(100), [57, 23, 10, 4, 1])
+        self.assertEqual(ciura_gaps(5000), [3937, 1750, 701, 301, 132, 57, 23, 10, 4, 1])
+        for gaps in GAP_SEQUENCES.values():
+            self.assertEqual(gaps(0), [1])
+            self.assertEqual(gaps(1), [1])
+
+    def test_gaps(self):
+        for name in GAP_SEQUENCES:
+            for n in [0, 1, 2, 10, 1000, 5000]:
+                test_array = [random.randint(0, n) for i in range(n)]
+                expected = sorted(test_array)
+                sort(test_array, gaps=name)
+                self.assertEqual(test_array, expected)
+        test_array = [random.random() for i in range(1000)]
+        expected = sorted(test_array)
+        sort(test_array, gaps=lambda n: [7, 3, 1])
+        self.assertEqual(test_array, expected)
+        with self.assertRaises(ValueError):
+            sort([2, 1], gaps="fibonacci")
+
+    def test_tune(self):
+        best, timings = tune([random.random() for i in range(500)], repeat=1)
+        self.assertIn(best, GAP_SEQUENCES)
+        self.assertEqual(set(timings), set(GAP_SEQUENCES))
+        best, timings = tune([3, 1, 2], candidates=["knuth"])
+        self.assertEqual(best, "knuth")
+
+    def test_tune_size(self):
+        # A sequence which records the array lengths it is asked for.
+        lengths = []
+        GAP_SEQUENCES["recording"] = lambda n: lengths.append(n) or knuth_gaps(n)
+        try:
+            tune([random.random() for i in range(100)], n=2000, candidates=["recording"], repeat=2)
+            self.assertEqual(lengths, [2000, 2000])
+            lengths.clear()
+            tune([random.random() for i in range(100)], candidates=["recording"], repeat=1)
+            self.assertEqual(lengths, [100])
+        finally:
+            del GAP_SEQUENCES["recording"]
+
+    def test_typed_buffers(self):
+        values = [random.randint(-100, 100) for i in range(1000)]
+        test_array = typed_array.array('i', values)
+        sort(test_array, reverse=True)
+        self.assertEqual(test_array.tolist(), sorted(values, reverse=True))
+        test_array = buffers.memoryview_of('d', values)
+        sort(test_array)
+        self.assertEqual(test_array.tolist(), sorted(values))
+
 
 if __name__ == '__main__':
     unittest.main()